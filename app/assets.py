@@ -0,0 +1,129 @@
+"""Fingerprinted, precompressed static assets.
+
+``scripts/build_static.py`` copies each file in static/ to static/dist/ under
+a content-hashed name, with .br/.gz variants of the text formats, and maps
+original to hashed names in static/dist/manifest.json. Templates link assets
+through ``static_url()``, so an edited file gets a new URL and every URL
+under /static/dist/ can be cached by browsers for good.
+
+Without a build (local development) ``static_url()`` falls back to the plain
+/static/ path with the file's mtime as a cache-buster.
+"""
+
+import functools
+import json
+import mimetypes
+import os
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+STATIC_DIR = Path("static")
+DIST_DIR = STATIC_DIR / "dist"
+
+# Content-hashed files never change, so they may be cached for a year without revalidating
+_IMMUTABLE = "public, max-age=31536000, immutable"
+# Preferred first
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@functools.cache
+def _manifest() -> dict[str, str]:
+    try:
+        return json.loads((DIST_DIR / "manifest.json").read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def static_url(name: str) -> str:
+    """URL of the static file *name* (e.g. ``style.css``), fingerprinted if built."""
+    hashed = _manifest().get(name)
+    if hashed is not None:
+        return f"/static/dist/{hashed}"
+    try:
+        version = int((STATIC_DIR / name).stat().st_mtime)
+    except FileNotFoundError:
+        return f"/static/{name}"
+    return f"/static/{name}?v={version}"
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    """Content codings an Accept-Encoding header allows (any with q > 0)."""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        params = params.strip()
+        try:
+            q = float(params.removeprefix("q=")) if params else 1.0
+        except ValueError:
+            q = 1.0
+        if q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+@functools.cache
+def _variant(full_path: str, suffix: str) -> os.stat_result | None:
+    # Only asked about files under dist/, which never change once built
+    try:
+        return os.stat(full_path + suffix)
+    except FileNotFoundError:
+        return None
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves the build's .br/.gz variants under /static/dist/.
+
+    Files there are content-hashed, so they are also sent as immutable.
+    Everything else is served exactly as StaticFiles would.
+    """
+
+    def __init__(self, *, directory: str, **kwargs) -> None:
+        super().__init__(directory=directory, **kwargs)
+        self._dist = os.path.realpath(os.path.join(directory, "dist"))
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        full_path = str(full_path)
+        if (
+            os.path.dirname(os.path.realpath(full_path)) != self._dist
+            or os.path.basename(full_path) == "manifest.json"
+        ):
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        request_headers = Headers(scope=scope)
+        headers = {"Cache-Control": _IMMUTABLE}
+        variants = [
+            (encoding, suffix, variant_stat)
+            for encoding, suffix in _ENCODINGS
+            if (variant_stat := _variant(full_path, suffix)) is not None
+        ]
+        if variants:
+            headers["Vary"] = "Accept-Encoding"
+        accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, suffix, variant_stat in variants:
+            if encoding in accepted:
+                response = FileResponse(
+                    full_path + suffix,
+                    status_code=status_code,
+                    stat_result=variant_stat,
+                    # Typed as the original file, not as an archive
+                    media_type=mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+                    headers={**headers, "Content-Encoding": encoding},
+                )
+                break
+        else:
+            response = FileResponse(
+                full_path, status_code=status_code, stat_result=stat_result, headers=headers
+            )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -13,6 +15,8 @@ class Settings(BaseSettings):
 
     # Database
     database_url: str = "sqlite:////data/issuebell.db"
+    # Threads running the background jobs' blocking DB work (keep ≤ the engine pool size)
+    db_thread_pool_size: int = 4
 
     # Discord
     discord_bot_token: str = ""
@@ -25,8 +29,93 @@ class Settings(BaseSettings):
     github_client_secret: str = ""
     github_redirect_uri: str = "http://localhost:8000/auth/github/callback"
 
-    # Polling interval in seconds (default 3 min)
+    # Shared outbound HTTP clients (GitHub / Discord)
+    http2: bool = True
+    http_max_connections: int = 50
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_timeout: float = 15.0
+    http_connect_timeout: float = 5.0
+
+    # In-memory LRU of Discord DM channel ids (backed by the dm_channels table)
+    dm_channel_cache_size: int = 10_000
+
+    # Compiled subscription label patterns kept in memory (LRU)
+    label_matcher_cache_size: int = 4096
+
+    # Logged-in users (and their subscription lists) cached per web process.
+    # A user's own writes show at once on every replica; other changes (e.g.
+    # the worker revoking a token) within the TTL
+    user_cache_size: int = 10_000
+    user_cache_ttl: float = 60.0
+
+    # A repo confirmed public (GET /repos/{repo} says `private: false`) may be
+    # polled with any user's token; the check is repeated after this long
+    github_visibility_ttl: int = 86400
+
+    # Upper bound on issue-list pages (100 issues each) read per repo per poll
+    github_max_pages: int = 10
+    # How issue lists are fetched: "rest" (one call per repo) or "graphql"
+    # (many repos per query; repos it can't answer fall back to REST)
+    github_backend: Literal["rest", "graphql"] = "rest"
+    # Repos per GraphQL query, and newest issues requested for each
+    github_graphql_batch_size: int = 25
+    github_graphql_issues_per_repo: int = 50
+
+    # GitHub webhooks (POST /webhooks/github). Empty secret disables the endpoint.
+    github_webhook_secret: str = ""
+    # A repo counts as push-covered (polled only every POLL_MAX_INTERVAL) for
+    # this long after its last webhook delivery
+    github_webhook_coverage_ttl: int = 86400
+    # `labeled` events only notify for issues opened within this many seconds
+    github_webhook_label_window: int = 86400
+
+    # Notification outbox sender (Discord DMs; concurrency is POLL_SEND_CONCURRENCY)
+    outbox_batch_size: int = 100
+    outbox_idle_interval: float = 5.0
+    outbox_max_attempts: int = 8
+    outbox_backoff_base: float = 5.0
+    outbox_backoff_max: float = 900.0
+    # Claimed rows are hidden from other senders for this long (crash recovery)
+    outbox_claim_timeout: float = 300.0
+    # Delivered-notification ledger: rows older than this are pruned, and the
+    # most recent keys are also kept in memory to skip the table lookup
+    ledger_ttl_days: int = 14
+    ledger_cache_size: int = 50_000
+    # Digest-mode DMs wait this long so a cycle's matches go out together
+    digest_delay: float = 30.0
+    # Longer Discord rate-limit waits are rescheduled rather than slept through
+    discord_max_rate_limit_wait: float = 10.0
+    # How long shutdown waits for an in-flight poll cycle and outbox batch
+    shutdown_grace_period: float = 20.0
+
+    # Run the poller and outbox sender inside the web process. Set to false when
+    # they run separately (`python -m app.worker`) so web replicas can scale freely.
+    run_worker: bool = True
+    # Worker replicas split repos into this many hash slots (PostgreSQL only)
+    worker_shard_slots: int = 64
+    # A worker that hasn't heartbeated for this long no longer counts as live
+    worker_lease_ttl: int = 60
+    # `python -m app.worker` serves GET /metrics on this port (0 = off); the
+    # web app serves it on its own port
+    metrics_port: int = 9100
+    # Bearer token scrapes of the web app's GET /metrics must send. Empty
+    # disables that endpoint (the worker's listener is internal and needs none).
+    metrics_token: str = ""
+
+    # Polling interval in seconds (default 3 min) for a repo that sees about one
+    # new issue per hour; busier repos are polled more often, quieter ones less.
     poll_interval: int = 180
+    poll_min_interval: int = 30
+    poll_max_interval: int = 1800
+    # How often the scheduler wakes up to poll whichever repos are due
+    poll_tick: int = 15
+    # Polling pipeline — concurrent workers per stage and bounded queue size.
+    # POLL_SEND_CONCURRENCY bounds concurrent Discord sends in the outbox sender.
+    poll_fetch_concurrency: int = 8
+    poll_match_concurrency: int = 2
+    poll_send_concurrency: int = 4
+    poll_queue_size: int = 100
 
 
 settings = Settings()
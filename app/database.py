@@ -1,5 +1,12 @@
-from sqlalchemy import create_engine
+import asyncio
+import functools
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.schema import CreateIndex
 
 from app.config import settings
 
@@ -8,11 +15,65 @@ _connect_args = {"check_same_thread": False} if settings.database_url.startswith
 engine = create_engine(settings.database_url, connect_args=_connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Background jobs (poller, outbox sender) share the web app's event loop, so
+# their blocking SQLAlchemy calls run on this pool instead of stalling requests.
+_db_executor = ThreadPoolExecutor(
+    max_workers=settings.db_thread_pool_size, thread_name_prefix="db"
+)
+
+T = TypeVar("T")
+
+
+async def run_db(fn: Callable[..., T], *args) -> T:
+    """Run blocking database work *fn(*args)* on the DB thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(fn, *args))
+
 
 class Base(DeclarativeBase):
     pass
 
 
+def dialect_insert(model):
+    """INSERT for *model* with the backend's ON CONFLICT support (SQLite or PostgreSQL)."""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def add_missing_columns() -> None:
+    """Bring existing tables up to the models after ``create_all``.
+
+    ``create_all`` only creates missing tables, so columns added to a model
+    later are ALTERed in here (they must be nullable or have a server
+    default), along with any index the table doesn't have yet.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    if isinstance(default, str):
+                        default = f"'{default}'"
+                    else:
+                        default = default.compile(dialect=engine.dialect)
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+            for index in table.indexes:
+                # IF NOT EXISTS rather than checkfirst: expression indexes
+                # aren't reflected, so checkfirst would recreate them
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,31 @@
+"""Logging setup shared by the web app and ``python -m app.worker``.
+
+Handlers run on a background thread: records are put on a queue, so a burst
+of log lines (httpx logs every request at INFO) never stalls the event loop
+on a slow or blocked stderr.
+"""
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+FORMAT = "%(levelname)s | %(name)s | %(message)s"
+
+
+def configure() -> None:
+    """Log INFO and above to stderr through a queue (once per process)."""
+    root = logging.getLogger()
+    if any(isinstance(handler, QueueHandler) for handler in root.handlers):
+        return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    # Records are formatted when queued (cheap) and only written by the listener
+    handler = QueueHandler(records)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    listener = QueueListener(records, stream, respect_handler_level=True)
+    listener.start()
+    # Flushes whatever is still queued on exit
+    atexit.register(listener.stop)
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
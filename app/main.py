@@ -1,107 +1,54 @@
 """IssueBell — FastAPI application entry point."""
 
+import gc
+import hmac
 import logging
-from collections import defaultdict
 from contextlib import asynccontextmanager
-from datetime import datetime, timezone
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
 
+from app import logs, worker
+from app.assets import PrecompressedStaticFiles, static_url
 from app.config import settings
-from app.database import SessionLocal, engine
-from app.models import Base, Subscription, User
-from app.routers import admin, auth, subscriptions
-from app.services.discord import send_dm
-from app.services.github import build_issue_message, fetch_new_issues, match_label
+from app.database import SessionLocal, add_missing_columns, engine
+from app.models import Base
+from app.routers import admin, auth, subscriptions, webhooks
+from app.services import metrics, safe_regex, user_cache
+from app.services.user_cache import CachedSubscription, CachedUser
+from app.services.http import close_clients, open_clients
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(name)s | %(message)s")
+logs.configure()
 
 # ── Schema bootstrap ─────────────────────────────────────────────────────────
 Base.metadata.create_all(bind=engine)
+add_missing_columns()
 
-
-# ── Background polling job ───────────────────────────────────────────────────
-
-async def poll_all_users() -> None:
-    """Check every user's subscriptions for new matching issues."""
-    db: Session = SessionLocal()
-    try:
-        users = db.query(User).filter(User.github_token.isnot(None)).all()
-        for user in users:
-            # Group subscriptions by repo — 1 API call per unique repo per user.
-            repo_map: dict[str, list[Subscription]] = defaultdict(list)
-            for sub in user.subscriptions:
-                repo_map[sub.repo_full_name].append(sub)
-
-            for repo, subs in repo_map.items():
-                checked_ats = [s.last_checked_at for s in subs if s.last_checked_at]
-                since = min(checked_ats) if checked_ats else None
-
-                try:
-                    issues = await fetch_new_issues(repo, user.github_token, since)
-                except Exception as exc:
-                    logger.warning("Polling %s failed: %s", repo, exc)
-                    continue
-
-                now = datetime.now(timezone.utc).replace(tzinfo=None)
-                for issue in issues:
-                    issue_labels = [lb["name"] for lb in issue.get("labels", [])]
-                    # Find the first subscription label that matches this issue —
-                    # send at most ONE DM per issue per user regardless of how many
-                    # subscriptions match.
-                    first_match = next(
-                        (
-                            (sub, matched)
-                            for sub in subs
-                            if (matched := match_label(sub.label, issue_labels)) is not None
-                        ),
-                        None,
-                    )
-                    if first_match is not None:
-                        _, matched_label = first_match
-                        try:
-                            await send_dm(
-                                user.discord_id,
-                                build_issue_message(issue, repo, matched_label),
-                            )
-                        except Exception as exc:
-                            logger.warning("DM to %s failed: %s", user.discord_id, exc)
-
-                for sub in subs:
-                    sub.last_checked_at = now
-                db.commit()
-    except Exception as exc:
-        logger.error("poll_all_users crashed: %s", exc, exc_info=True)
-    finally:
-        db.close()
+# Modules, routes, templates and mappers live as long as the process; frozen,
+# they are no longer rescanned by every full GC collection, each of which
+# would otherwise stall the event loop for tens of milliseconds.
+gc.freeze()
 
 
 # ── App lifecycle ────────────────────────────────────────────────────────────
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    scheduler = AsyncIOScheduler()
-    scheduler.add_job(
-        poll_all_users,
-        "interval",
-        seconds=settings.poll_interval,
-        id="poll_all_users",
-        replace_existing=True,
-    )
-    scheduler.start()
-    logger.info("Scheduler started (interval=%ss)", settings.poll_interval)
+    open_clients()
+    # Webhook deliveries match labels in this process too
+    safe_regex.warm_up()
+    # With RUN_WORKER=false the poller runs in `python -m app.worker` instead.
+    scheduler = worker.start() if settings.run_worker else None
     try:
         yield
     finally:
-        scheduler.shutdown(wait=False)
-        logger.info("Scheduler stopped")
+        if scheduler is not None:
+            await worker.stop(scheduler)
+        await close_clients()
 
 
 # ── FastAPI app ──────────────────────────────────────────────────────────────
@@ -110,35 +57,52 @@ app = FastAPI(title="IssueBell", version="0.2.0", lifespan=lifespan)
 
 app.add_middleware(SessionMiddleware, secret_key=settings.secret_key)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["static_url"] = static_url
 
 app.include_router(auth.router)
 app.include_router(subscriptions.router)
 app.include_router(admin.router)
+app.include_router(webhooks.router)
 
 
 # ── Web UI ───────────────────────────────────────────────────────────────────
 
+def _load_user(user_id: int, version: int) -> CachedUser | None:
+    db = SessionLocal()
+    try:
+        return user_cache.get_user(db, user_id, version)
+    finally:
+        db.close()
+
+
+def _load_home(user_id: int, version: int) -> tuple[CachedUser | None, tuple[CachedSubscription, ...]]:
+    db = SessionLocal()
+    try:
+        user = user_cache.get_user(db, user_id, version)
+        return user, user_cache.get_subscriptions(db, user_id, version) if user else ()
+    finally:
+        db.close()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     user_id = request.session.get("user_id")
     user = None
-    subs: list[Subscription] = []
+    subs: tuple[CachedSubscription, ...] = ()
 
     if user_id:
-        db: Session = SessionLocal()
-        try:
-            user = db.get(User, user_id)
-            if user:
-                subs = (
-                    db.query(Subscription)
-                    .filter(Subscription.user_id == user.id)
-                    .order_by(Subscription.created_at.desc())
-                    .all()
-                )
-        finally:
-            db.close()
+        version = user_cache.session_version(request.session)
+        user = user_cache.cached_user(user_id, version)
+        cached_subs = user_cache.cached_subscriptions(user_id, version) if user else None
+        if cached_subs is not None:
+            subs = cached_subs
+        else:
+            # Cache misses query the database, which must not block the event
+            # loop; hits skip the threadpool hop, which is slow while a poll
+            # cycle keeps the DB threads busy.
+            user, subs = await run_in_threadpool(_load_home, user_id, version)
 
     return templates.TemplateResponse(
         "index.html",
@@ -151,11 +115,24 @@ async def manage(request: Request):
     user_id = request.session.get("user_id")
     if not user_id:
         return RedirectResponse(url="/")
-    db: Session = SessionLocal()
-    try:
-        user = db.get(User, user_id)
-        if user is None or user.discord_id != settings.admin_discord_id:
-            return RedirectResponse(url="/")
-    finally:
-        db.close()
+    version = user_cache.session_version(request.session)
+    user = user_cache.cached_user(user_id, version)
+    if user is None:
+        user = await run_in_threadpool(_load_user, user_id, version)
+    if user is None or not user.is_admin:
+        return RedirectResponse(url="/")
     return templates.TemplateResponse("manage.html", {"request": request, "user": user})
+
+
+# ── Metrics ──────────────────────────────────────────────────────────────────
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics_endpoint(authorization: str | None = Header(default=None)):
+    # The app is public and some gauges query the database, so scrapes must
+    # present METRICS_TOKEN; without one the endpoint is off.
+    if not settings.metrics_token:
+        raise HTTPException(status_code=404, detail="Metrics are not configured")
+    if not hmac.compare_digest(authorization or "", f"Bearer {settings.metrics_token}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    # Sync on purpose: some gauges query the database, so this runs in the threadpool.
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,6 +1,17 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, UniqueConstraint, func
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    false,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -19,6 +30,12 @@ class User(Base):
     github_id: Mapped[str | None] = mapped_column(String, unique=True, index=True, nullable=True)
     github_username: Mapped[str | None] = mapped_column(String, nullable=True)
     github_token: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Set when GitHub rejects the token (401); cleared when the user reconnects
+    github_token_revoked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Bundle bursts of matches into a few digest DMs instead of one DM per issue
+    digest_mode: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default=false()
+    )
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     subscriptions: Mapped[list["Subscription"]] = relationship(
@@ -26,6 +43,22 @@ class User(Base):
     )
 
 
+# Admin user search: pages are walked in (lower(username), id) order, and the
+# search box matches name prefixes. text_pattern_ops lets PostgreSQL answer a
+# left-anchored LIKE from the index whatever the database collation.
+Index("ix_users_username_order", func.lower(User.username), User.id)
+Index(
+    "ix_users_username_prefix",
+    func.lower(User.username).label("username_lower"),
+    postgresql_ops={"username_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_users_github_username_prefix",
+    func.lower(User.github_username).label("github_username_lower"),
+    postgresql_ops={"github_username_lower": "text_pattern_ops"},
+)
+
+
 class Subscription(Base):
     """User's subscription to a GitHub repo + label combination."""
 
@@ -42,6 +75,111 @@ class Subscription(Base):
     label: Mapped[str] = mapped_column(String, nullable=False)
     # timestamp of last successful poll for this subscription
     last_checked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Why the pattern is no longer matched (e.g. a backreference saved before
+    # such patterns were refused); None while the subscription is active
+    disabled_reason: Mapped[str | None] = mapped_column(String, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     user: Mapped["User"] = relationship("User", back_populates="subscriptions")
+
+
+class DMChannel(Base):
+    """Cached Discord DM channel id for a user — it never changes once opened."""
+
+    __tablename__ = "dm_channels"
+
+    discord_id: Mapped[str] = mapped_column(String, primary_key=True)
+    channel_id: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+
+class RepoValidator(Base):
+    """HTTP cache validators from the last poll of a repo's issue list."""
+
+    __tablename__ = "repo_validators"
+
+    repo_full_name: Mapped[str] = mapped_column(String, primary_key=True)
+    etag: Mapped[str | None] = mapped_column(String, nullable=True)
+    last_modified: Mapped[str | None] = mapped_column(String, nullable=True)
+    body_digest: Mapped[str | None] = mapped_column(String, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), onupdate=func.now()
+    )
+
+
+class RepoCursor(Base):
+    """High-water mark of a repo's issue list: the newest issue number polled so far."""
+
+    __tablename__ = "repo_cursors"
+
+    repo_full_name: Mapped[str] = mapped_column(String, primary_key=True)
+    last_issue_number: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), onupdate=func.now()
+    )
+
+
+class RepoVisibility(Base):
+    """Whether a repo was last seen public, which decides if other users' tokens may poll it."""
+
+    __tablename__ = "repo_visibility"
+
+    repo_full_name: Mapped[str] = mapped_column(String, primary_key=True)
+    public: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    checked_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class WebhookRepo(Base):
+    """A repo whose issue events are pushed to us by a GitHub webhook."""
+
+    __tablename__ = "webhook_repos"
+
+    repo_full_name: Mapped[str] = mapped_column(String, primary_key=True)
+    last_delivery_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+
+class NotificationLedger(Base):
+    """One row per issue DM queued for a user — the unique key makes re-queueing a no-op."""
+
+    __tablename__ = "notification_ledger"
+    __table_args__ = (
+        UniqueConstraint("user_id", "repo_full_name", "issue_number", name="uq_ledger_user_repo_issue"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    repo_full_name: Mapped[str] = mapped_column(String, nullable=False)
+    issue_number: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), index=True)
+
+
+class WorkerHeartbeat(Base):
+    """A live poller worker; used to size each worker's share of the repo slots."""
+
+    __tablename__ = "worker_heartbeats"
+
+    worker_id: Mapped[str] = mapped_column(String, primary_key=True)
+    last_seen_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class OutboxMessage(Base):
+    """A Discord DM waiting to be delivered by the notification sender."""
+
+    __tablename__ = "notification_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    discord_id: Mapped[str] = mapped_column(String, nullable=False)
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    # "pending" until sent (then the row is deleted) or given up on ("failed")
+    status: Mapped[str] = mapped_column(String, nullable=False, default="pending", index=True)
+    # Digest rows for the same user are packed into shared messages when sent
+    digest: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default=false()
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), index=True
+    )
+    last_error: Mapped[str | None] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
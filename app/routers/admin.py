@@ -1,57 +1,153 @@
 """Admin endpoints — accessible only to the configured admin Discord user."""
 
+import base64
+import json
+from collections.abc import Iterator
+
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy.orm import Session, joinedload
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
 
-from app.config import settings
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.models import Subscription, User
+from app.services import user_cache
+from app.services.user_cache import CachedUser
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+# Number of most-subscribed repos reported by /admin/stats
+_TOP_REPOS = 10
+
 
-def require_admin(request: Request, db: Session = Depends(get_db)) -> User:
+def require_admin(request: Request, db: Session = Depends(get_db)) -> CachedUser:
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    user = db.get(User, user_id)
-    if user is None or user.discord_id != settings.admin_discord_id:
+    user = user_cache.get_user(db, user_id, user_cache.session_version(request.session))
+    if user is None or not user.is_admin:
         raise HTTPException(status_code=403, detail="Forbidden")
     return user
 
 
+def _encode_cursor(name: str, user_id: int) -> str:
+    raw = json.dumps([name, user_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        name, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(name, str) or not isinstance(user_id, int):
+            raise ValueError
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return name, user_id
+
+
+def _like_prefix(q: str) -> str:
+    """A LIKE pattern matching names that start with *q*, taken literally."""
+    escaped = q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def _user_json(user: User, subs: list[Subscription]) -> dict:
+    return {
+        "id": user.id,
+        "discord_id": user.discord_id,
+        "username": user.username,
+        "avatar": user.avatar,
+        "github_username": user.github_username,
+        "github_connected": user.github_token is not None,
+        "github_revoked": user.github_token_revoked_at is not None,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "subscriptions": [
+            {
+                "id": s.id,
+                "repo_full_name": s.repo_full_name,
+                "label": s.label,
+                "last_checked_at": s.last_checked_at.isoformat() if s.last_checked_at else None,
+            }
+            for s in subs
+        ],
+    }
+
+
+def _stream_page(q: str, after: tuple[str, int] | None, limit: int) -> Iterator[str]:
+    """Yield one page of users as a JSON object, a user at a time.
+
+    Runs after the request's own session is gone, so it opens its own.
+    """
+    db = SessionLocal()
+    try:
+        name = func.lower(User.username)
+        # The cursor keeps the database's lower(), which needn't agree with str.lower()
+        query = select(User, name).order_by(name, User.id).limit(limit + 1)
+        if q:
+            like = _like_prefix(q)
+            query = query.where(
+                name.like(like, escape="\\")
+                | func.lower(User.github_username).like(like, escape="\\")
+            )
+        if after is not None:
+            query = query.where(tuple_(name, User.id) > tuple_(*after))
+        rows = db.execute(query).all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        users = [user for user, _ in rows]
+
+        subs: dict[int, list[Subscription]] = {u.id: [] for u in users}
+        if users:
+            for sub in db.scalars(
+                select(Subscription)
+                .where(Subscription.user_id.in_(subs))
+                .order_by(Subscription.user_id, Subscription.id)
+            ):
+                subs[sub.user_id].append(sub)
+
+        yield '{"users":['
+        for i, user in enumerate(users):
+            yield ("," if i else "") + json.dumps(_user_json(user, subs[user.id]))
+        next_cursor = _encode_cursor(rows[-1][1], rows[-1][0].id) if more else None
+        yield '],"next":' + json.dumps(next_cursor) + "}"
+    finally:
+        db.close()
+
+
 @router.get("/users")
 def list_users(
-    q: str = Query(default="", description="Filter by Discord or GitHub username"),
-    _admin: User = Depends(require_admin),
+    q: str = Query(default="", description="Discord or GitHub username prefix"),
+    after: str | None = Query(default=None, description="Cursor from the previous page's `next`"),
+    limit: int = Query(default=50, ge=1, le=500),
+    _admin: CachedUser = Depends(require_admin),
+):
+    """Return a page of users with their subscriptions, in username order.
+
+    Pages are keyset-paginated: pass the previous page's ``next`` as
+    ``after`` to continue; ``next`` is null on the last page.
+    """
+    cursor = _decode_cursor(after) if after else None
+    return StreamingResponse(_stream_page(q.strip(), cursor, limit), media_type="application/json")
+
+
+@router.get("/stats")
+def stats(
+    _admin: CachedUser = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    """Return all users with their subscriptions. Optionally filter by username."""
-    query = db.query(User).options(joinedload(User.subscriptions))
-    if q:
-        like = f"%{q.lower()}%"
-        query = query.filter(
-            User.username.ilike(like) | User.github_username.ilike(like)
-        )
-    users = query.order_by(User.username).all()
-    return [
-        {
-            "id": u.id,
-            "discord_id": u.discord_id,
-            "username": u.username,
-            "avatar": u.avatar,
-            "github_username": u.github_username,
-            "github_connected": u.github_token is not None,
-            "created_at": u.created_at.isoformat() if u.created_at else None,
-            "subscriptions": [
-                {
-                    "id": s.id,
-                    "repo_full_name": s.repo_full_name,
-                    "label": s.label,
-                    "last_checked_at": s.last_checked_at.isoformat() if s.last_checked_at else None,
-                }
-                for s in u.subscriptions
-            ],
-        }
-        for u in users
-    ]
+    """User and subscription totals, and the most-subscribed repos."""
+    users, connected = db.execute(select(func.count(), func.count(User.github_token))).one()
+    subscriptions = db.scalar(select(func.count()).select_from(Subscription))
+    subscribers = func.count().label("subscribers")
+    top = db.execute(
+        select(Subscription.repo_full_name, subscribers)
+        .group_by(Subscription.repo_full_name)
+        .order_by(subscribers.desc(), Subscription.repo_full_name)
+        .limit(_TOP_REPOS)
+    ).all()
+    return {
+        "users": users,
+        "github_connected": connected,
+        "subscriptions": subscriptions,
+        "top_repos": [{"repo_full_name": repo, "subscriptions": n} for repo, n in top],
+    }
@@ -4,7 +4,6 @@ import logging
 import time
 from urllib.parse import urlencode
 
-import httpx
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse
 from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
@@ -12,7 +11,9 @@ from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
 from app.config import settings
 from app.database import SessionLocal
 from app.models import User
-from app.services.discord import build_welcome_message, send_dm
+from app.services import outbox, user_cache
+from app.services.discord import build_welcome_message
+from app.services.http import discord_client, github_client
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 logger = logging.getLogger(__name__)
@@ -55,40 +56,43 @@ async def discord_callback(request: Request, code: str = "", state: str = ""):
     except (BadSignature, SignatureExpired):
         return RedirectResponse("/?error=invalid_state")
 
-    async with httpx.AsyncClient() as client:
-        token_resp = await client.post(
-            f"{DISCORD_API}/oauth2/token",
-            data={
-                "client_id": settings.discord_client_id,
-                "client_secret": settings.discord_client_secret,
-                "grant_type": "authorization_code",
-                "code": code,
-                "redirect_uri": settings.discord_redirect_uri,
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
-        token_resp.raise_for_status()
-        access_token = token_resp.json()["access_token"]
-
-        user_resp = await client.get(
-            f"{DISCORD_API}/users/@me",
-            headers={"Authorization": f"Bearer {access_token}"},
-        )
-        user_resp.raise_for_status()
-        discord_user = user_resp.json()
+    client = discord_client()
+    token_resp = await client.post(
+        f"{DISCORD_API}/oauth2/token",
+        data={
+            "client_id": settings.discord_client_id,
+            "client_secret": settings.discord_client_secret,
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": settings.discord_redirect_uri,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    token_resp.raise_for_status()
+    access_token = token_resp.json()["access_token"]
+
+    user_resp = await client.get(
+        f"{DISCORD_API}/users/@me",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    user_resp.raise_for_status()
+    discord_user = user_resp.json()
 
     db = SessionLocal()
-    is_new_user = False
     try:
         user = db.query(User).filter(User.discord_id == discord_user["id"]).first()
         if user is None:
-            is_new_user = True
             user = User(
                 discord_id=discord_user["id"],
                 username=discord_user["username"],
                 avatar=discord_user.get("avatar"),
             )
             db.add(user)
+            # Delivered by the outbox sender with retries; a user who has DMs
+            # disabled still ends up with a completed, usable signup.
+            outbox.enqueue(
+                db, [(discord_user["id"], build_welcome_message(discord_user["username"]))]
+            )
         else:
             user.username = discord_user["username"]
             user.avatar = discord_user.get("avatar")
@@ -96,19 +100,10 @@ async def discord_callback(request: Request, code: str = "", state: str = ""):
         db.refresh(user)
     finally:
         db.close()
+    outbox.wake()
 
     request.session["user_id"] = user.id
-
-    if is_new_user:
-        try:
-            await send_dm(
-                discord_user["id"],
-                build_welcome_message(discord_user["username"]),
-            )
-        except Exception as exc:
-            # A user may disable DMs or Discord may be temporarily unavailable.
-            # Their completed signup must remain usable in either case.
-            logger.warning("Welcome DM to %s failed: %s", discord_user["id"], exc)
+    user_cache.record_write(request.session, user.id)
 
     return RedirectResponse("/")
 
@@ -145,34 +140,34 @@ async def github_callback(request: Request, code: str = "", state: str = ""):
     if not user_id:
         return RedirectResponse("/")
 
-    async with httpx.AsyncClient() as client:
-        # Exchange code for token
-        token_resp = await client.post(
-            "https://github.com/login/oauth/access_token",
-            data={
-                "client_id": settings.github_client_id,
-                "client_secret": settings.github_client_secret,
-                "code": code,
-                "redirect_uri": settings.github_redirect_uri,
-            },
-            headers={"Accept": "application/json"},
-        )
-        token_resp.raise_for_status()
-        token_data = token_resp.json()
-        github_token = token_data.get("access_token")
-        if not github_token:
-            return RedirectResponse("/?error=github_token_failed")
-
-        # Fetch GitHub user info
-        gh_user_resp = await client.get(
-            f"{GITHUB_API}/user",
-            headers={
-                "Authorization": f"Bearer {github_token}",
-                "Accept": "application/vnd.github+json",
-            },
-        )
-        gh_user_resp.raise_for_status()
-        gh_user = gh_user_resp.json()
+    client = github_client()
+    # Exchange code for token
+    token_resp = await client.post(
+        "https://github.com/login/oauth/access_token",
+        data={
+            "client_id": settings.github_client_id,
+            "client_secret": settings.github_client_secret,
+            "code": code,
+            "redirect_uri": settings.github_redirect_uri,
+        },
+        headers={"Accept": "application/json"},
+    )
+    token_resp.raise_for_status()
+    token_data = token_resp.json()
+    github_token = token_data.get("access_token")
+    if not github_token:
+        return RedirectResponse("/?error=github_token_failed")
+
+    # Fetch GitHub user info
+    gh_user_resp = await client.get(
+        f"{GITHUB_API}/user",
+        headers={
+            "Authorization": f"Bearer {github_token}",
+            "Accept": "application/vnd.github+json",
+        },
+    )
+    gh_user_resp.raise_for_status()
+    gh_user = gh_user_resp.json()
 
     db = SessionLocal()
     try:
@@ -181,9 +176,11 @@ async def github_callback(request: Request, code: str = "", state: str = ""):
             user.github_id = str(gh_user["id"])
             user.github_username = gh_user["login"]
             user.github_token = github_token
+            user.github_token_revoked_at = None
             db.commit()
     finally:
         db.close()
+    user_cache.record_write(request.session, user_id)
 
     return RedirectResponse("/")
 
@@ -200,9 +197,11 @@ async def github_disconnect(request: Request):
             user.github_id = None
             user.github_username = None
             user.github_token = None
+            user.github_token_revoked_at = None
             db.commit()
     finally:
         db.close()
+    user_cache.record_write(request.session, user_id)
     return RedirectResponse("/")
 
 
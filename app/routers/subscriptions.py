@@ -3,21 +3,24 @@
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import Subscription, User
-from app.schemas import SubscriptionCreate, SubscriptionRead
+from app.schemas import DigestSetting, SubscriptionCreate, SubscriptionRead
+from app.services import subscription_index, user_cache
+from app.services.user_cache import CachedSubscription, CachedUser
 
 router = APIRouter(prefix="/subscriptions", tags=["subscriptions"])
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> CachedUser:
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    user = db.get(User, user_id)
+    user = user_cache.get_user(db, user_id, user_cache.session_version(request.session))
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     return user
@@ -25,22 +28,21 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
 
 @router.get("/", response_model=list[SubscriptionRead])
 def list_subscriptions(
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db),
-):
+) -> tuple[CachedSubscription, ...]:
     """Return all subscriptions for the logged-in user."""
-    return (
-        db.query(Subscription)
-        .filter(Subscription.user_id == current_user.id)
-        .order_by(Subscription.created_at.desc())
-        .all()
+    return user_cache.get_subscriptions(
+        db, current_user.id, user_cache.session_version(request.session)
     )
 
 
 @router.post("/", response_model=SubscriptionRead, status_code=201)
 def create_subscription(
+    request: Request,
     payload: SubscriptionCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Add a new repo+label subscription for the logged-in user."""
@@ -60,13 +62,30 @@ def create_subscription(
             status_code=409,
             detail="You already have a subscription for this repo + label combination.",
         )
+    subscription_index.add(sub)
+    user_cache.record_write(request.session, current_user.id)
     return sub
 
 
+@router.put("/digest", response_model=DigestSetting)
+def set_digest_mode(
+    request: Request,
+    payload: DigestSetting,
+    current_user: CachedUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Turn digest mode (bursts bundled into a few DMs) on or off."""
+    db.execute(update(User).where(User.id == current_user.id).values(digest_mode=payload.enabled))
+    db.commit()
+    user_cache.record_write(request.session, current_user.id)
+    return DigestSetting(enabled=payload.enabled)
+
+
 @router.delete("/{subscription_id}", status_code=204)
 def delete_subscription(
+    request: Request,
     subscription_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Remove a subscription. Users can only delete their own."""
@@ -78,3 +97,5 @@ def delete_subscription(
         raise HTTPException(status_code=404, detail="Subscription not found")
     db.delete(sub)
     db.commit()
+    subscription_index.remove(subscription_id)
+    user_cache.record_write(request.session, current_user.id)
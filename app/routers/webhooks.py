@@ -0,0 +1,88 @@
+"""GitHub webhook receiver — push-based fast path for new issues."""
+
+import hashlib
+import hmac
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services import ledger, metrics, outbox, push
+from app.services.github import issue_created_at
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/webhooks", tags=["webhooks"])
+
+
+def verify_signature(body: bytes, signature: str | None) -> bool:
+    """Check GitHub's ``X-Hub-Signature-256`` header against *body*."""
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(settings.github_webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.removeprefix("sha256="))
+
+
+def _ingest(event: str, payload: dict) -> int:
+    """Record the delivery and queue DMs for an issue event; returns DMs queued."""
+    # Stored lowercased everywhere (subscriptions, cursors, push coverage);
+    # GitHub sends the repo's own spelling.
+    repo = payload["repository"]["full_name"].lower()
+    issue = payload.get("issue")
+    action = payload.get("action")
+    labels: list[str] = []
+    if event == "issues" and issue and "pull_request" not in issue:
+        if action == "opened":
+            labels = [lb["name"] for lb in issue.get("labels", [])]
+        elif action == "labeled" and payload.get("label"):
+            # Only the label just added: the others were matched when they were.
+            age = datetime.now(timezone.utc).replace(tzinfo=None) - issue_created_at(issue)
+            if age <= timedelta(seconds=settings.github_webhook_label_window):
+                labels = [payload["label"]["name"]]
+
+    db = SessionLocal()
+    try:
+        push.record_delivery(db, repo)
+        claimed = push.queue_issue(db, repo, issue, labels) if labels else set()
+        db.commit()
+    finally:
+        db.close()
+    ledger.remember(claimed)
+    metrics.notifications_queued.inc(len(claimed), source="webhook")
+    return len(claimed)
+
+
+@router.post("/github")
+async def github_webhook(
+    request: Request,
+    x_github_event: str = Header(default=""),
+    x_hub_signature_256: str | None = Header(default=None),
+):
+    """Receive a GitHub webhook delivery (``issues`` opened/labeled)."""
+    if not settings.github_webhook_secret:
+        raise HTTPException(status_code=404, detail="Webhooks are not configured")
+    body = await request.body()
+    if not verify_signature(body, x_hub_signature_256):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not JSON")
+
+    # Any delivery naming a repo (a repo hook's ping included) proves coverage.
+    if "repository" not in payload:
+        return {"ok": True, "queued": 0}
+    queued = await run_in_threadpool(_ingest, x_github_event, payload)
+    if queued:
+        outbox.wake()
+        logger.info(
+            "Webhook: %d DM(s) queued for %s#%s",
+            queued,
+            payload["repository"]["full_name"],
+            payload["issue"]["number"],
+        )
+    return {"ok": True, "queued": queued}
@@ -3,6 +3,8 @@ from datetime import datetime
 
 from pydantic import BaseModel, Field, field_validator
 
+from app.services.safe_regex import UnsafePattern, check
+
 
 # ─── User ──────────────────────────────────────────────────────────────────────
 
@@ -38,15 +40,28 @@ class SubscriptionCreate(BaseModel):
     @classmethod
     def label_must_be_valid_regex(cls, v: str) -> str:
         try:
-            re.compile(v)
+            check(v)
         except re.error as exc:
             raise ValueError(f"Invalid regular expression: {exc}") from exc
+        except UnsafePattern as exc:
+            raise ValueError(f"Unsupported regular expression: {exc}") from exc
         return v
 
 
-class SubscriptionRead(SubscriptionCreate):
+class SubscriptionRead(BaseModel):
+    # Not a SubscriptionCreate: stored labels are echoed back as they are,
+    # including ones disabled because they no longer pass its validator
     id: int
+    repo_full_name: str
+    label: str
     user_id: int
+    disabled_reason: str | None = None
     created_at: datetime
 
     model_config = {"from_attributes": True}
+
+
+# ─── Notification settings ─────────────────────────────────────────────────────
+
+class DigestSetting(BaseModel):
+    enabled: bool
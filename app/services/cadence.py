@@ -0,0 +1,76 @@
+"""Adaptive per-repo polling cadence.
+
+Each repo keeps an exponentially-decayed estimate of how many issues are
+opened there per hour. Its polling interval is derived from that rate:
+
+    interval = POLL_INTERVAL / sqrt(issues per hour)
+
+clamped to [POLL_MIN_INTERVAL, POLL_MAX_INTERVAL]. Spending quota in
+proportion to sqrt(rate) minimises the average detection latency per issue
+for a fixed number of calls, so busy repos are polled every ~30s while
+dormant ones drift out to ~30 min. A repo with no history starts at one
+issue per hour, i.e. exactly POLL_INTERVAL.
+"""
+
+import math
+import time
+from dataclasses import dataclass
+
+from app.config import settings
+
+# Time constant (seconds) of the decayed issue rate — roughly "the last 6 hours".
+_RATE_WINDOW = 6 * 3600
+_DEFAULT_RATE = 1 / 3600  # one issue per hour, in issues per second
+
+
+@dataclass(slots=True)
+class RepoCadence:
+    rate: float = _DEFAULT_RATE
+    last_polled_at: float | None = None
+    next_poll_at: float = 0.0
+
+    @property
+    def interval(self) -> float:
+        per_hour = max(self.rate * 3600, 1e-6)
+        interval = settings.poll_interval / math.sqrt(per_hour)
+        return min(max(interval, settings.poll_min_interval), settings.poll_max_interval)
+
+
+_cadences: dict[str, RepoCadence] = {}
+
+
+def get(repo: str) -> RepoCadence:
+    cadence = _cadences.get(repo)
+    if cadence is None:
+        cadence = _cadences[repo] = RepoCadence()
+    return cadence
+
+
+def overdue(repo: str, now: float | None = None) -> float:
+    """Seconds since *repo* became due; negative if it is not due yet."""
+    now = time.time() if now is None else now
+    return now - get(repo).next_poll_at
+
+
+def record_poll(repo: str, new_issues: int, now: float | None = None) -> None:
+    """Fold one successful poll into the repo's rate and schedule the next one."""
+    now = time.time() if now is None else now
+    cadence = get(repo)
+    if cadence.last_polled_at is not None:
+        elapsed = max(now - cadence.last_polled_at, 0.0)
+        cadence.rate *= math.exp(-elapsed / _RATE_WINDOW)
+    cadence.rate += new_issues / _RATE_WINDOW
+    cadence.last_polled_at = now
+    cadence.next_poll_at = now + cadence.interval
+
+
+def defer(repo: str, until: float) -> None:
+    """Don't poll *repo* again before *until* (e.g. its token is rate limited)."""
+    cadence = get(repo)
+    cadence.next_poll_at = max(cadence.next_poll_at, until)
+
+
+def forget(repos: set[str]) -> None:
+    """Drop state for repos nobody subscribes to anymore."""
+    for repo in repos:
+        _cadences.pop(repo, None)
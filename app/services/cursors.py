@@ -0,0 +1,117 @@
+"""Per-repo high-water-mark cursors.
+
+A repo's cursor is the highest issue number (and its created_at) that the
+poller has already seen. Issue numbers only grow, so "new" means "numbered
+above the cursor" — no wall-clock comparison, no clock skew, and nothing to
+re-fetch after a slow cycle. A subscription added later simply inherits the
+repo's cursor. Repos without a cursor yet fall back to the subscribers'
+last_checked_at timestamps for their first poll.
+
+Cursors live in memory and are persisted to ``repo_cursors`` together with
+the cycle's checkpoints.
+"""
+
+from collections.abc import Collection
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models import RepoCursor
+
+
+@dataclass(slots=True, frozen=True)
+class Cursor:
+    number: int
+    created_at: datetime
+
+
+_cache: dict[str, Cursor] = {}
+_dirty: set[str] = set()
+_forgotten: set[str] = set()
+_loaded = False
+
+
+def get(repo: str) -> Cursor | None:
+    return _cache.get(repo)
+
+
+def advance(repo: str, cursor: Cursor) -> None:
+    """Move *repo*'s cursor forward; never backwards."""
+    current = _cache.get(repo)
+    if current is None or cursor.number > current.number:
+        _cache[repo] = cursor
+        _dirty.add(repo)
+        _forgotten.discard(repo)
+
+
+def retain(subscribed: Collection[str]) -> None:
+    """Drop the cursors of repos nobody subscribes to anymore.
+
+    A stale cursor would otherwise make a later re-subscription replay every
+    issue opened in between.
+    """
+    for repo in _cache.keys() - subscribed:
+        del _cache[repo]
+        _dirty.discard(repo)
+        _forgotten.add(repo)
+
+
+def load(db: Session) -> None:
+    """Fill the in-memory cache from the database (once per process)."""
+    global _loaded
+    if _loaded:
+        return
+    rows = db.execute(
+        select(
+            RepoCursor.repo_full_name,
+            RepoCursor.last_issue_number,
+            RepoCursor.last_created_at,
+        ).execution_options(yield_per=1000)
+    )
+    for repo, number, created_at in rows:
+        _cache.setdefault(repo, Cursor(number, created_at))
+    _loaded = True
+
+
+def invalidate() -> None:
+    """Make the next load() re-read the table, e.g. after another worker polled these repos.
+
+    Unflushed changes stay in memory and win over the table.
+    """
+    global _loaded
+    for repo in _cache.keys() - _dirty:
+        del _cache[repo]
+    _loaded = False
+
+
+def flush(db: Session) -> None:
+    """Upsert changed cursors and delete forgotten ones on *db*; the caller commits."""
+    global _dirty, _forgotten
+    dirty, _dirty = _dirty, set()
+    forgotten, _forgotten = _forgotten, set()
+    if forgotten:
+        db.execute(delete(RepoCursor).where(RepoCursor.repo_full_name.in_(forgotten)))
+    rows = [
+        {
+            "repo_full_name": repo,
+            "last_issue_number": cursor.number,
+            "last_created_at": cursor.created_at,
+        }
+        for repo in dirty
+        if (cursor := _cache.get(repo)) is not None
+    ]
+    if not rows:
+        return
+    stmt = dialect_insert(RepoCursor)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[RepoCursor.repo_full_name],
+        set_={
+            "last_issue_number": stmt.excluded.last_issue_number,
+            "last_created_at": stmt.excluded.last_created_at,
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt, rows)
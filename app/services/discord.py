@@ -1,38 +1,223 @@
-"""Discord bot helper — sends DMs to users."""
+"""Discord bot helper — sends DMs to users.
+
+Every bot request goes through ``_request``, which follows Discord's rate
+limits: per-route buckets learned from ``X-RateLimit-Bucket`` /
+``X-RateLimit-Remaining`` / ``X-RateLimit-Reset-After``, plus the global
+limit announced by a 429 with ``"global": true``.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 
 import httpx
 
 from app.config import settings
+from app.database import SessionLocal, dialect_insert, run_db
+from app.models import DMChannel
+from app.services import metrics
+from app.services.http import discord_client
 
 DISCORD_API = "https://discord.com/api/v10"
 
+# discord user id → DM channel id. A user's DM channel never changes, so the
+# id is persisted in `dm_channels` and kept in this LRU in front of the table.
+_channel_cache: OrderedDict[str, str] = OrderedDict()
+
+
+class DiscordRateLimited(Exception):
+    """Discord asked us to back off; the request may be retried after *retry_after* seconds."""
+
+    def __init__(self, retry_after: float, is_global: bool = False) -> None:
+        super().__init__(f"rate limited for {retry_after:.1f}s (global={is_global})")
+        self.retry_after = retry_after
+        self.is_global = is_global
+
+
+@dataclass(slots=True)
+class _Bucket:
+    remaining: int | None = None
+    # time.monotonic() at which `remaining` refills
+    reset_at: float = 0.0
+
+
+# route template → bucket hash reported by Discord (routes may share a bucket)
+_route_buckets: dict[str, str] = {}
+# "<bucket hash or route>:<major parameter>" → bucket state
+_buckets: dict[str, _Bucket] = {}
+_global_blocked_until = 0.0
+
 
 async def _bot_headers() -> dict:
     return {"Authorization": f"Bot {settings.discord_bot_token}"}
 
 
+def _bucket(route: str, major: str) -> _Bucket:
+    key = f"{_route_buckets.get(route, route)}:{major}"
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = _Bucket()
+    return bucket
+
+
+def _record_limits(route: str, major: str, resp: httpx.Response) -> None:
+    global _global_blocked_until
+    now = time.monotonic()
+    bucket_hash = resp.headers.get("X-RateLimit-Bucket")
+    if bucket_hash:
+        _route_buckets[route] = bucket_hash
+    bucket = _bucket(route, major)
+    try:
+        if "X-RateLimit-Remaining" in resp.headers:
+            bucket.remaining = int(resp.headers["X-RateLimit-Remaining"])
+        if "X-RateLimit-Reset-After" in resp.headers:
+            bucket.reset_at = now + float(resp.headers["X-RateLimit-Reset-After"])
+    except ValueError:
+        pass
+
+    if resp.status_code != 429:
+        return
+    try:
+        body = resp.json()
+    except ValueError:
+        body = {}
+    retry_after = float(body.get("retry_after") or resp.headers.get("Retry-After") or 1.0)
+    is_global = bool(body.get("global")) or resp.headers.get("X-RateLimit-Scope") == "global"
+    metrics.discord_rate_limited.inc(scope="global" if is_global else "route")
+    if is_global:
+        _global_blocked_until = max(_global_blocked_until, now + retry_after)
+    else:
+        bucket.remaining = 0
+        bucket.reset_at = max(bucket.reset_at, now + retry_after)
+    raise DiscordRateLimited(retry_after, is_global)
+
+
+async def _request(method: str, route: str, major: str, path: str, **kwargs) -> httpx.Response:
+    """Send a bot request, waiting out a known-exhausted bucket first.
+
+    Waits longer than DISCORD_MAX_RATE_LIMIT_WAIT are not slept through but
+    raised as DiscordRateLimited, so the caller can reschedule instead.
+    """
+    bucket = _bucket(route, major)
+    now = time.monotonic()
+    wait = max(_global_blocked_until - now, 0.0)
+    if bucket.remaining is not None and bucket.remaining <= 0 and bucket.reset_at > now:
+        wait = max(wait, bucket.reset_at - now)
+    if wait > settings.discord_max_rate_limit_wait:
+        raise DiscordRateLimited(wait, is_global=_global_blocked_until - now >= wait)
+    if wait > 0:
+        await asyncio.sleep(wait)
+    if bucket.remaining:
+        bucket.remaining -= 1
+
+    started = time.perf_counter()
+    resp = await discord_client().request(
+        method, f"{DISCORD_API}{path}", headers=await _bot_headers(), **kwargs
+    )
+    metrics.discord_request_seconds.observe(time.perf_counter() - started, route=route)
+    _record_limits(route, major, resp)
+    return resp
+
+
 async def open_dm_channel(discord_user_id: str) -> str:
     """Create (or retrieve) a DM channel with a Discord user. Returns the channel id."""
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            f"{DISCORD_API}/users/@me/channels",
-            json={"recipient_id": discord_user_id},
-            headers=await _bot_headers(),
+    resp = await _request(
+        "POST",
+        "/users/@me/channels",
+        "",
+        "/users/@me/channels",
+        json={"recipient_id": discord_user_id},
+    )
+    resp.raise_for_status()
+    return resp.json()["id"]
+
+
+def _remember_channel(discord_user_id: str, channel_id: str) -> None:
+    _channel_cache[discord_user_id] = channel_id
+    _channel_cache.move_to_end(discord_user_id)
+    while len(_channel_cache) > settings.dm_channel_cache_size:
+        _channel_cache.popitem(last=False)
+
+
+def _load_channel(discord_user_id: str) -> str | None:
+    db = SessionLocal()
+    try:
+        row = db.get(DMChannel, discord_user_id)
+        return row.channel_id if row else None
+    finally:
+        db.close()
+
+
+def _store_channel(discord_user_id: str, channel_id: str) -> None:
+    db = SessionLocal()
+    try:
+        # Concurrent first sends to one user may both open the channel; last write wins.
+        stmt = dialect_insert(DMChannel).values(discord_id=discord_user_id, channel_id=channel_id)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[DMChannel.discord_id],
+                set_={"channel_id": stmt.excluded.channel_id},
+            )
         )
-        resp.raise_for_status()
-        return resp.json()["id"]
+        db.commit()
+    finally:
+        db.close()
+
+
+def _delete_channel(discord_user_id: str) -> None:
+    db = SessionLocal()
+    try:
+        db.query(DMChannel).filter(DMChannel.discord_id == discord_user_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+async def forget_dm_channel(discord_user_id: str) -> None:
+    """Drop a cached DM channel id, e.g. after Discord rejected it."""
+    _channel_cache.pop(discord_user_id, None)
+    await run_db(_delete_channel, discord_user_id)
+
+
+async def get_dm_channel(discord_user_id: str) -> str:
+    """Return the DM channel id for a user: LRU, then database, then Discord."""
+    channel_id = _channel_cache.get(discord_user_id)
+    if channel_id is None:
+        channel_id = await run_db(_load_channel, discord_user_id)
+        if channel_id is None:
+            channel_id = await open_dm_channel(discord_user_id)
+            await run_db(_store_channel, discord_user_id, channel_id)
+    _remember_channel(discord_user_id, channel_id)
+    return channel_id
+
+
+async def _post_message(channel_id: str, content: str) -> httpx.Response:
+    return await _request(
+        "POST",
+        "/channels/{channel_id}/messages",
+        channel_id,
+        f"/channels/{channel_id}/messages",
+        json={"content": content},
+    )
 
 
 async def send_dm(discord_user_id: str, content: str) -> None:
-    """Send a direct message to a Discord user via the bot."""
-    channel_id = await open_dm_channel(discord_user_id)
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            f"{DISCORD_API}/channels/{channel_id}/messages",
-            json={"content": content},
-            headers=await _bot_headers(),
-        )
-        resp.raise_for_status()
+    """Send a direct message to a Discord user via the bot.
+
+    Raises DiscordRateLimited when Discord throttles the request and
+    httpx.HTTPStatusError for any other failure.
+    """
+    channel_id = await get_dm_channel(discord_user_id)
+    resp = await _post_message(channel_id, content)
+    if resp.status_code in (403, 404):
+        # The cached channel is unusable — forget it so the next send starts
+        # fresh. An unknown channel (404) is worth one immediate retry.
+        await forget_dm_channel(discord_user_id)
+        if resp.status_code == 404:
+            channel_id = await get_dm_channel(discord_user_id)
+            resp = await _post_message(channel_id, content)
+    resp.raise_for_status()
 
 
 def build_welcome_message(username: str) -> str:
@@ -0,0 +1,100 @@
+"""Per-repo HTTP validator cache for conditional GitHub requests.
+
+GitHub answers a matching ``If-None-Match`` / ``If-Modified-Since`` with a
+304, which does not count against the rate limit. The validators live in
+memory and are persisted to the ``repo_validators`` table so they survive
+restarts.
+"""
+
+from dataclasses import dataclass
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models import RepoValidator
+
+
+@dataclass(slots=True)
+class Validators:
+    etag: str | None = None
+    last_modified: str | None = None
+    # sha256 of the last 200 body, to skip JSON parsing when it did not change
+    body_digest: str | None = None
+
+
+_cache: dict[str, Validators] = {}
+_dirty: set[str] = set()
+_loaded = False
+
+
+def get(repo: str) -> Validators | None:
+    return _cache.get(repo)
+
+
+def put(repo: str, validators: Validators) -> None:
+    _cache[repo] = validators
+    _dirty.add(repo)
+
+
+def load(db: Session) -> None:
+    """Fill the in-memory cache from the database (once per process)."""
+    global _loaded
+    if _loaded:
+        return
+    rows = db.execute(
+        select(
+            RepoValidator.repo_full_name,
+            RepoValidator.etag,
+            RepoValidator.last_modified,
+            RepoValidator.body_digest,
+        ).execution_options(yield_per=1000)
+    )
+    for repo, etag, last_modified, body_digest in rows:
+        _cache.setdefault(repo, Validators(etag, last_modified, body_digest))
+    _loaded = True
+
+
+def invalidate() -> None:
+    """Make the next load() re-read the table, e.g. after another worker polled these repos.
+
+    Unflushed changes stay in memory and win over the table.
+    """
+    global _loaded
+    for repo in _cache.keys() - _dirty:
+        del _cache[repo]
+    _loaded = False
+
+
+def flush(db: Session) -> None:
+    """Upsert every changed entry on *db* in one statement; the caller commits.
+
+    Runs on a DB thread while fetches may still be updating the cache, so it
+    swaps the dirty set out rather than iterating it in place.
+    """
+    global _dirty
+    dirty, _dirty = _dirty, set()
+    if not dirty:
+        return
+    stmt = dialect_insert(RepoValidator)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[RepoValidator.repo_full_name],
+        set_={
+            "etag": stmt.excluded.etag,
+            "last_modified": stmt.excluded.last_modified,
+            "body_digest": stmt.excluded.body_digest,
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(
+        stmt,
+        [
+            {
+                "repo_full_name": repo,
+                "etag": _cache[repo].etag,
+                "last_modified": _cache[repo].last_modified,
+                "body_digest": _cache[repo].body_digest,
+            }
+            for repo in dirty
+        ],
+    )
@@ -1,10 +1,15 @@
 ﻿"""GitHub API helpers  polling-based issue detection."""
 
-import re
-from datetime import datetime, timezone
-
-import httpx
+import hashlib
+import time
+from collections.abc import AsyncIterator
+from datetime import datetime
 
+from app.config import settings
+from app.services import cursors, etag_cache, metrics
+from app.services.tokens import RepoUnavailable, TokenRevoked
+from app.services.http import github_client
+from app.services.ratelimit import check_response
 
 GITHUB_API = "https://api.github.com"
 _GH_HEADERS = {
@@ -13,52 +18,153 @@ _GH_HEADERS = {
 }
 
 
-async def fetch_new_issues(
+async def iter_new_issues(
     repo: str,
     token: str,
     since: datetime | None,
-) -> list[dict]:
-    """Return issues (not PRs) in *repo* created after *since*.
+    cursor: cursors.Cursor | None = None,
+) -> AsyncIterator[list[dict]]:
+    """Yield pages of issues (not PRs) in *repo* past its cursor, newest first.
 
     Uses the authenticated user's token so rate-limit is per-user (5 000 req/hr).
-    *since* is compared against created_at, not updated_at.
+    Pages are listed by created_at descending and followed through the `Link`
+    header. With a *cursor* the walk stops at the first issue numbered at or
+    below it; otherwise at the first one created at or before *since*
+    (compared against created_at, not updated_at). With neither, only the
+    first page is read. A completed walk moves the repo's cursor to the
+    newest item listed.
+
+    The first request is conditional on the repo's cached validators: a 304,
+    or a 200 whose body is byte-identical to the last one, yields nothing
+    without parsing any JSON.
+
+    Raises ratelimit.RateLimited when GitHub throttles the token,
+    tokens.TokenRevoked when it rejects the token (401), and
+    tokens.RepoUnavailable when the token can't see the repo (403/404).
     """
-    params: dict = {
+    # No `since` query param: it filters by updated_at anyway, and a URL that
+    # changes every cycle would never match a cached ETag.
+    url: str | None = f"{GITHUB_API}/repos/{repo}/issues"
+    params: dict | None = {
         "state": "open",
-        "per_page": 50,
+        "per_page": 100,
         "sort": "created",
         "direction": "desc",
     }
-    if since:
-        # GitHub `since` filters by updated_at, so we pass it but re-filter by created_at below.
-        since_utc = since.replace(tzinfo=timezone.utc) if since.tzinfo is None else since
-        params["since"] = since_utc.strftime("%Y-%m-%dT%H:%M:%SZ")
 
     headers = {**_GH_HEADERS, "Authorization": f"Bearer {token}"}
-
-    async with httpx.AsyncClient(timeout=15) as client:
-        resp = await client.get(
-            f"{GITHUB_API}/repos/{repo}/issues",
-            params=params,
-            headers=headers,
-        )
-        if resp.status_code in (404, 403, 401):
-            return []
+    cached = etag_cache.get(repo)
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+    since_naive = since.replace(tzinfo=None) if since and cursor is None else None
+    max_pages = settings.github_max_pages if cursor or since_naive else 1
+    fresh: etag_cache.Validators | None = None
+    newest: cursors.Cursor | None = None
+    for page in range(max_pages):
+        started = time.perf_counter()
+        resp = await github_client().get(url, params=params, headers=headers)
+        metrics.github_request_seconds.observe(time.perf_counter() - started, backend="rest")
+        metrics.github_responses.inc(backend="rest", status=str(resp.status_code))
+        check_response(token, resp.status_code, resp.headers)
+        if resp.status_code == 304:
+            break
+        if resp.status_code == 401:
+            raise TokenRevoked(token)
+        if resp.status_code in (403, 404):
+            raise RepoUnavailable(repo, resp.status_code)
         resp.raise_for_status()
-        issues: list[dict] = resp.json()
 
-    # Strip pull requests (GitHub issues endpoint returns them too)
-    issues = [i for i in issues if "pull_request" not in i]
-
-    # Re-filter to created_at > since (the API filters by updated_at)
-    if since:
-        since_naive = since.replace(tzinfo=None)
-        issues = [
-            i for i in issues
-            if _parse_gh_dt(i["created_at"]) > since_naive
-        ]
+        if page == 0:
+            digest = hashlib.sha256(resp.content).hexdigest()
+            fresh = etag_cache.Validators(
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+                body_digest=digest,
+            )
+            if cached is not None and cached.body_digest == digest:
+                break
+            # Validators only apply to the first page; the rest are fetched plainly.
+            headers = {**_GH_HEADERS, "Authorization": f"Bearer {token}"}
+
+        items: list[dict] = resp.json()
+        if page == 0:
+            newest = newest_cursor(items)
+        batch, reached_since = take_new_issues(items, since_naive, cursor)
+        if batch:
+            yield batch
+
+        url = resp.links.get("next", {}).get("url")
+        if reached_since or url is None:
+            break
+        params = None  # the next-page URL already carries the query string
+
+    # Only remember the first page's validators once the whole walk succeeded;
+    # otherwise a later 304 would hide the pages that were never read.
+    if fresh is not None:
+        etag_cache.put(repo, fresh)
+    if newest is not None:
+        cursors.advance(repo, newest)
+
+
+def take_new_issues(
+    items: list[dict],
+    since: datetime | None,
+    cursor: cursors.Cursor | None,
+) -> tuple[list[dict], bool]:
+    """Cut a newest-first page of issues at *cursor* (or, without one, at *since*).
 
-    return issues
+    Returns the issues past the boundary, with pull requests stripped, and
+    whether the boundary was reached on this page.
+    """
+    batch: list[dict] = []
+    for item in items:
+        if cursor is not None:
+            if item["number"] <= cursor.number:
+                return batch, True
+        elif since and _parse_gh_dt(item["created_at"]) <= since:
+            return batch, True
+        # Strip pull requests (GitHub issues endpoint returns them too)
+        if "pull_request" not in item:
+            batch.append(item)
+    return batch, False
+
+
+def newest_cursor(items: list[dict]) -> cursors.Cursor | None:
+    """The cursor a walk whose first page is *items* should advance to."""
+    if not items:
+        return None
+    # PRs share the number sequence, so the newest item of either kind counts.
+    top = max(items, key=lambda item: item["number"])
+    return cursors.Cursor(top["number"], _parse_gh_dt(top["created_at"]))
+
+
+async def is_public_repo(repo: str, token: str) -> bool:
+    """Ask GitHub whether *repo* is public (``GET /repos/{repo}``).
+
+    Only a 200 saying ``private: false`` (and, on GitHub Enterprise, not an
+    ``internal`` repo) counts; a repo *token* can't see (403/404) is
+    reported as not public. Raises ratelimit.RateLimited when GitHub
+    throttles the token and tokens.TokenRevoked when it rejects it (401).
+    """
+    started = time.perf_counter()
+    resp = await github_client().get(
+        f"{GITHUB_API}/repos/{repo}",
+        headers={**_GH_HEADERS, "Authorization": f"Bearer {token}"},
+    )
+    metrics.github_request_seconds.observe(time.perf_counter() - started, backend="rest")
+    metrics.github_responses.inc(backend="rest", status=str(resp.status_code))
+    check_response(token, resp.status_code, resp.headers)
+    if resp.status_code == 401:
+        raise TokenRevoked(token)
+    if resp.status_code in (403, 404):
+        return False
+    resp.raise_for_status()
+    data = resp.json()
+    return data.get("private") is False and data.get("visibility", "public") == "public"
 
 
 def _parse_gh_dt(dt_str: str) -> datetime:
@@ -66,12 +172,9 @@ def _parse_gh_dt(dt_str: str) -> datetime:
     return datetime.fromisoformat(dt_str.replace("Z", "+00:00")).replace(tzinfo=None)
 
 
-def match_label(pattern: str, issue_labels: list[str]) -> str | None:
-    """Return the first label name that matches the regex pattern, or None."""
-    for label in issue_labels:
-        if re.fullmatch(pattern, label, re.IGNORECASE):
-            return label
-    return None
+def issue_created_at(issue: dict) -> datetime:
+    """Return an issue's creation time as a naive UTC datetime."""
+    return _parse_gh_dt(issue["created_at"])
 
 
 def build_issue_message(issue: dict, repo: str, matched_label: str) -> str:
@@ -79,12 +182,23 @@ def build_issue_message(issue: dict, repo: str, matched_label: str) -> str:
     url    = issue.get("html_url", "")
     number = issue.get("number", "?")
     author = issue.get("user", {}).get("login", "unknown")
-    labels = ", ".join(f"`{lb['name']}`" for lb in issue.get("labels", []))
+    labels = ", ".join(f"`{lb['name']}`" for lb in issue.get("labels", [])) or "\u2014"
 
     return (
         f"\U0001f514 **New issue on `{repo}`**\n"
         f"**#{number} \u2014 {title}**\n"
         f"\U0001f464 Opened by **{author}**\n"
-        f"\U0001f3f7\ufe0f Labels: {labels or '\u2014'}\n"
+        f"\U0001f3f7\ufe0f Labels: {labels}\n"
         f"\U0001f517 {url}"
     )
+
+
+def build_digest_entry(issue: dict, repo: str, matched_label: str) -> str:
+    """One issue as a compact digest line; the sender packs these into shared DMs."""
+    title  = issue.get("title", "(no title)")
+    url    = issue.get("html_url", "")
+    number = issue.get("number", "?")
+    if len(title) > 200:
+        title = title[:199] + "\u2026"
+
+    return f"\u2022 `{repo}` **#{number} \u2014 {title}** (`{matched_label}`)\n  <{url}>"
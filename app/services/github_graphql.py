@@ -0,0 +1,148 @@
+"""GitHub GraphQL backend — the newest issues of many repos in one request.
+
+Each repo becomes an aliased ``repository`` sub-query of a single GraphQL
+document, so a batch of repos costs one request (and a few rate-limit points)
+instead of one REST call each. Results are converted to the same dict shape
+the REST issues endpoint returns, so matching and ``build_issue_message``
+don't care which backend produced them.
+
+GraphQL points are a separate budget from REST calls; the ``rateLimit``
+field of every response keeps it current in ``ratelimit`` under the
+"graphql" resource.
+
+Each repo's ``visibility`` comes back with its issues, so the poller learns
+for free which repos are public (see ``visibility``) and may share a token.
+"""
+
+import logging
+import time
+from datetime import datetime
+
+from app.config import settings
+from app.services import metrics
+from app.services.github import GITHUB_API
+from app.services.http import github_client
+from app.services.ratelimit import RateLimited, budget_for, check_response
+from app.services.tokens import TokenRevoked
+
+logger = logging.getLogger(__name__)
+
+GRAPHQL_URL = f"{GITHUB_API}/graphql"
+
+_REPO_FRAGMENT = """
+fragment NewestIssues on Repository {
+  visibility
+  issues(first: $first, states: OPEN, orderBy: {field: CREATED_AT, direction: DESC}) {
+    nodes {
+      number
+      title
+      url
+      createdAt
+      author { login }
+      labels(first: 50) { nodes { name } }
+    }
+  }
+}
+"""
+
+
+class GraphQLError(Exception):
+    """GitHub answered the query with errors and no usable data."""
+
+
+def _build_query(repos: list[str]) -> tuple[str, dict]:
+    """Return the query document and variables for *repos* (aliases r0, r1, ...)."""
+    params = ["$first: Int!"]
+    fields = ["rateLimit { cost remaining resetAt limit }"]
+    variables: dict = {"first": settings.github_graphql_issues_per_repo}
+    for i, repo in enumerate(repos):
+        owner, name = repo.split("/", 1)
+        params += [f"$o{i}: String!", f"$n{i}: String!"]
+        fields.append(f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ ...NewestIssues }}")
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = name
+    query = f"query({', '.join(params)}) {{\n  " + "\n  ".join(fields) + "\n}\n" + _REPO_FRAGMENT
+    return query, variables
+
+
+def _to_rest(node: dict) -> dict:
+    """Reshape an Issue node like the REST issues endpoint would return it."""
+    author = node.get("author")
+    return {
+        "number": node["number"],
+        "title": node["title"],
+        "html_url": node["url"],
+        "created_at": node["createdAt"],
+        # A deleted account comes back as null; REST reports it as "ghost".
+        "user": {"login": author["login"] if author else "ghost"},
+        "labels": [{"name": label["name"]} for label in node["labels"]["nodes"]],
+    }
+
+
+def _record_cost(token: str, rate_limit: dict | None) -> None:
+    if not rate_limit:
+        return
+    budget = budget_for(token, "graphql")
+    budget.limit = rate_limit["limit"]
+    budget.remaining = rate_limit["remaining"]
+    budget.reset_at = datetime.fromisoformat(rate_limit["resetAt"].replace("Z", "+00:00")).timestamp()
+    logger.debug(
+        "GraphQL query cost %d points, %d left", rate_limit["cost"], rate_limit["remaining"]
+    )
+
+
+async def fetch_newest_issues(
+    token: str, repos: list[str]
+) -> tuple[dict[str, list[dict] | None], dict[str, bool]]:
+    """Return each repo's newest open issues (newest first) as REST-shaped dicts.
+
+    A repo maps to None when the query could not answer for it (not found,
+    no access, malformed name) — the caller should fall back to REST for it.
+    The second dict says, for every repo answered, whether GitHub reports it
+    public. Raises RateLimited when the token's GraphQL budget is exhausted
+    and GraphQLError / httpx errors when the request as a whole failed.
+    """
+    results: dict[str, list[dict] | None] = {
+        repo: None for repo in repos if repo.count("/") != 1
+    }
+    public: dict[str, bool] = {}
+    queried = [repo for repo in repos if repo not in results]
+    if not queried:
+        return results, public
+
+    budget = budget_for(token, "graphql")
+    if budget.allowance(settings.poll_tick) == 0:
+        raise RateLimited(max(budget.blocked_until, budget.reset_at))
+
+    query, variables = _build_query(queried)
+    started = time.perf_counter()
+    resp = await github_client().post(
+        GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    metrics.github_request_seconds.observe(time.perf_counter() - started, backend="graphql")
+    metrics.github_responses.inc(backend="graphql", status=str(resp.status_code))
+    check_response(token, resp.status_code, resp.headers, "graphql")
+    if resp.status_code == 401:
+        raise TokenRevoked(token)
+    resp.raise_for_status()
+
+    body = resp.json()
+    data = body.get("data") or {}
+    errors = body.get("errors") or []
+    _record_cost(token, data.get("rateLimit"))
+    if any(error.get("type") == "RATE_LIMITED" for error in errors):
+        budget.remaining = 0
+        budget.block(budget.reset_at)
+        raise RateLimited(budget.blocked_until)
+    if not data:
+        raise GraphQLError("; ".join(error.get("message", "?") for error in errors) or "no data")
+
+    # Per-repo failures (NOT_FOUND, FORBIDDEN, ...) null out just that alias.
+    for i, repo in enumerate(queried):
+        node = data.get(f"r{i}")
+        results[repo] = [_to_rest(issue) for issue in node["issues"]["nodes"]] if node else None
+        if node:
+            public[repo] = node.get("visibility") == "PUBLIC"
+    return results, public
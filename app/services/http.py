@@ -0,0 +1,69 @@
+"""Shared, pooled HTTP clients for outbound API calls.
+
+One long-lived ``httpx.AsyncClient`` per upstream keeps TCP+TLS connections
+alive between requests instead of paying a fresh handshake for every call.
+The clients are opened in the app's ``lifespan`` and closed on shutdown; code
+running outside the app (scripts, workers) gets them lazily on first use.
+"""
+
+import importlib.util
+import logging
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 without it.
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=settings.http2 and _HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+    )
+
+
+def _client(name: str) -> httpx.AsyncClient:
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _clients[name] = _build_client()
+    return client
+
+
+def github_client() -> httpx.AsyncClient:
+    """Client for api.github.com and github.com OAuth."""
+    return _client("github")
+
+
+def discord_client() -> httpx.AsyncClient:
+    """Client for the Discord REST API and Discord OAuth."""
+    return _client("discord")
+
+
+def open_clients() -> None:
+    """Create every shared client up front (called from the app lifespan)."""
+    github_client()
+    discord_client()
+    logger.info(
+        "HTTP clients ready (http2=%s, max_connections=%s)",
+        settings.http2 and _HTTP2_AVAILABLE,
+        settings.http_max_connections,
+    )
+
+
+async def close_clients() -> None:
+    """Close every shared client and drop its pooled connections."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
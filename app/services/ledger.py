@@ -0,0 +1,115 @@
+"""Ledger of issue notifications already queued, so no user gets the same DM twice.
+
+Each (user, repo, issue number) is inserted into ``notification_ledger`` in
+the same transaction as its outbox row, with ON CONFLICT DO NOTHING on the
+unique key. Only keys the insert actually claimed get a DM, so a crash
+before the checkpoint is written, a restart, an overlapping cycle, another
+worker, or a webhook racing the poller can all re-find an issue safely.
+
+Recently claimed keys are also kept in memory, which lets the poller drop
+most repeats before they reach the database. Rows older than
+LEDGER_TTL_DAYS are pruned — by then the repo cursor has long moved past
+those issues.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, dialect_insert
+from app.models import NotificationLedger
+from app.services import outbox
+
+logger = logging.getLogger(__name__)
+
+# (user_id, repo_full_name, issue_number)
+Key = tuple[int, str, int]
+
+_lock = threading.Lock()
+_recent: OrderedDict[Key, None] = OrderedDict()
+
+
+def seen(key: Key) -> bool:
+    """True if *key* is known to be claimed already (False means "ask the table")."""
+    with _lock:
+        return key in _recent
+
+
+def remember(keys: set[Key]) -> None:
+    """Add committed keys to the in-memory window."""
+    with _lock:
+        for key in keys:
+            _recent[key] = None
+            _recent.move_to_end(key)
+        while len(_recent) > settings.ledger_cache_size:
+            _recent.popitem(last=False)
+
+
+def claim(db: Session, keys: set[Key]) -> set[Key]:
+    """Insert *keys* on *db* and return the ones that were not there yet.
+
+    The caller queues DMs for exactly the returned keys in the same
+    transaction, commits, then calls remember().
+    """
+    keys = {key for key in keys if not seen(key)}
+    if not keys:
+        return set()
+    stmt = (
+        dialect_insert(NotificationLedger)
+        .on_conflict_do_nothing(
+            index_elements=["user_id", "repo_full_name", "issue_number"]
+        )
+        .returning(
+            NotificationLedger.user_id,
+            NotificationLedger.repo_full_name,
+            NotificationLedger.issue_number,
+        )
+    )
+    rows = db.execute(
+        stmt,
+        [
+            {"user_id": user_id, "repo_full_name": repo, "issue_number": number}
+            for user_id, repo, number in keys
+        ],
+    )
+    return {tuple(row) for row in rows}
+
+
+def enqueue(db: Session, notifications: list[tuple[Key, str, str, bool]]) -> set[Key]:
+    """Stage DMs on *db* for the (key, discord_id, content, digest) notifications not sent yet.
+
+    Returns the claimed keys; the caller commits, then calls remember() with
+    them and outbox.wake().
+    """
+    claimed = claim(db, {key for key, _, _, _ in notifications})
+    for digest in (False, True):
+        outbox.enqueue(
+            db,
+            [
+                (discord_id, content)
+                for key, discord_id, content, is_digest in notifications
+                if key in claimed and is_digest is digest
+            ],
+            digest=digest,
+        )
+    return claimed
+
+
+def prune() -> None:
+    """Delete ledger rows older than LEDGER_TTL_DAYS."""
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=settings.ledger_ttl_days)
+    db: Session = SessionLocal()
+    try:
+        deleted = db.execute(
+            delete(NotificationLedger).where(NotificationLedger.created_at < cutoff)
+        ).rowcount
+        db.commit()
+    finally:
+        db.close()
+    if deleted:
+        logger.info("Pruned %d notification ledger rows", deleted)
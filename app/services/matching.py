@@ -0,0 +1,86 @@
+"""Label matching — compiled subscription patterns with a literal fast path.
+
+Subscription labels are regexes matched case-insensitively against the whole
+label name. Most of them are plain names such as ``good first issue``; those
+skip the regex engine entirely and are matched by a case-folded dict lookup.
+Everything else is compiled once into a linear-time automaton (see
+``safe_regex``) and kept in an LRU, so no pattern can make matching backtrack.
+"""
+
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from app.config import settings
+from app.services.safe_regex import PatternSet
+
+_REGEX_META = frozenset(".^$*+?{}[]\\|()")
+
+
+def is_literal(pattern: str) -> bool:
+    """True if *pattern* contains no regex metacharacters."""
+    return not _REGEX_META.intersection(pattern)
+
+
+class LabelMatcher:
+    """One compiled subscription pattern."""
+
+    __slots__ = ("pattern", "literal", "regex")
+
+    def __init__(self, pattern: str) -> None:
+        """Raises re.error or safe_regex.UnsafePattern for a pattern that can't be used."""
+        self.pattern = pattern
+        # Case folding only mirrors re.IGNORECASE exactly for ASCII text.
+        self.literal = pattern.casefold() if is_literal(pattern) and pattern.isascii() else None
+        self.regex = None if self.literal is not None else PatternSet([pattern])
+
+    def matches(self, label: str) -> bool:
+        if self.literal is not None:
+            return label.casefold() == self.literal
+        return bool(self.regex.match(label))
+
+
+_compiled: OrderedDict[str, LabelMatcher] = OrderedDict()
+
+
+def compile_label(pattern: str) -> LabelMatcher:
+    """Return the cached matcher for *pattern*, compiling it on first use."""
+    matcher = _compiled.get(pattern)
+    if matcher is None:
+        matcher = _compiled[pattern] = LabelMatcher(pattern)
+        while len(_compiled) > settings.label_matcher_cache_size:
+            _compiled.popitem(last=False)
+    else:
+        _compiled.move_to_end(pattern)
+    return matcher
+
+
+class RepoMatcher:
+    """Every distinct pattern subscribed on one repo, tested in a single pass.
+
+    Literal patterns are looked up by case-folded label. The regex patterns
+    share one automaton, which reports every pattern a label matches in a
+    single pass over it.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self._literals: dict[str, list[str]] = {}
+        self._regexes: list[str] = []
+        for pattern in dict.fromkeys(patterns):
+            matcher = compile_label(pattern)
+            if matcher.literal is not None:
+                self._literals.setdefault(matcher.literal, []).append(pattern)
+            else:
+                self._regexes.append(pattern)
+        self._automaton = PatternSet(self._regexes) if self._regexes else None
+
+    def match(self, labels: list[str]) -> dict[str, str]:
+        """Map each pattern that matches any of *labels* to the first label it matched."""
+        hits: dict[str, str] = {}
+        for label in labels:
+            for pattern in self._literals.get(label.casefold(), ()):
+                hits.setdefault(pattern, label)
+            if self._automaton is None:
+                continue
+            for index in self._automaton.match(label):
+                hits.setdefault(self._regexes[index], label)
+        return hits
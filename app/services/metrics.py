@@ -0,0 +1,286 @@
+"""In-process metrics for the polling and notification hot paths.
+
+Counters, gauges and histograms live in plain dicts keyed by label values and
+are rendered on demand in the Prometheus text exposition format — by
+``GET /metrics`` on the web app (for scrapes bearing METRICS_TOKEN), and
+by a small HTTP listener on the internal METRICS_PORT in
+``python -m app.worker``. Recording a sample is a dict update
+under a lock; nothing is pushed anywhere.
+
+Values that already live elsewhere (rate-limit budgets, queue sizes, the
+outbox backlog) are gauges with a callback, read only when scraped.
+
+Label values must stay low-cardinality: token keys and stage names are
+fine, repo names are not (per-repo timings go into the histograms unlabeled).
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+import threading
+from collections.abc import Callable
+
+from app.database import run_db
+
+logger = logging.getLogger(__name__)
+
+# Seconds — fits both GitHub calls and a whole poll cycle.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+_registry: list["_Metric"] = []
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+
+class Counter(_Metric):
+    """A value that only goes up (events, items processed)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, set directly or read from *collect* at scrape time.
+
+    *collect* returns {label values: value}.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        collect: Callable[[], dict[tuple[str, ...], float]] | None = None,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> list[str]:
+        if self._collect is not None:
+            try:
+                values = list(self._collect().items())
+            except Exception as exc:
+                logger.warning("Collecting %s failed: %s", self.name, exc)
+                return []
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative ``le`` buckets, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values → [per-bucket counts (last one is +Inf), sum]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        names = (*self.labels, "le")
+        lines: list[str] = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, (*key, _format_value(bound)))} {cumulative}"
+                )
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text format.
+
+    Callback gauges may hit the database, so call this off the event loop.
+    """
+    lines: list[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()).strip():
+            pass  # headers are irrelevant
+        parts = request_line.split()
+        if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+            body = (await run_db(render)).encode()
+            status = "200 OK"
+        else:
+            body = b"Not Found\n"
+            status = "404 Not Found"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except Exception as exc:
+        logger.warning("Serving metrics failed: %s", exc)
+    finally:
+        writer.close()
+
+
+async def serve(port: int) -> asyncio.Server:
+    """Expose ``GET /metrics`` on *port* (for processes without the web app)."""
+    server = await asyncio.start_server(_handle, port=port)
+    logger.info("Metrics on :%d/metrics", port)
+    return server
+
+
+# ── Metrics ─────────────────────────────────────────────────────────────────
+# Callback gauges are attached by the modules that own the data.
+
+poll_cycle_seconds = Histogram(
+    "issuebell_poll_cycle_seconds", "Duration of poll cycles that fetched at least one repo."
+)
+poll_cycle_overruns = Counter(
+    "issuebell_poll_cycle_overruns_total",
+    "Poll cycles that took longer than POLL_TICK, so the next tick was skipped.",
+)
+poll_repos = Counter(
+    "issuebell_poll_repos_total",
+    "Repos polled, by outcome (ok, rate_limited, failed).",
+    ("outcome",),
+)
+github_request_seconds = Histogram(
+    "issuebell_github_request_seconds",
+    "Latency of GitHub issue-list requests (one per REST page or GraphQL batch).",
+    ("backend",),
+)
+github_responses = Counter(
+    "issuebell_github_responses_total",
+    "GitHub issue-list responses by status (304 = unchanged, nothing parsed).",
+    ("backend", "status"),
+)
+github_fetch_seconds = Histogram(
+    "issuebell_github_fetch_seconds",
+    "Time to poll one repo over REST, all pages included.",
+)
+github_fetch_issues = Histogram(
+    "issuebell_github_fetch_issues",
+    "New issues found per repo poll.",
+    buckets=SIZE_BUCKETS,
+)
+discord_request_seconds = Histogram(
+    "issuebell_discord_request_seconds", "Latency of Discord bot API requests.", ("route",)
+)
+discord_rate_limited = Counter(
+    "issuebell_discord_rate_limited_total",
+    "Discord 429 responses, by scope (global or route).",
+    ("scope",),
+)
+notifications_matched = Counter(
+    "issuebell_notifications_matched_total",
+    "(user, issue) matches found, before the ledger drops already-notified ones.",
+    ("source",),
+)
+notifications_queued = Counter(
+    "issuebell_notifications_queued_total",
+    "Notifications claimed in the ledger and written to the outbox.",
+    ("source",),
+)
+outbox_deliveries = Counter(
+    "issuebell_outbox_messages_total",
+    "Outbox rows by delivery outcome (sent, retry, failed).",
+    ("outcome",),
+)
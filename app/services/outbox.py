@@ -0,0 +1,288 @@
+"""Durable notification outbox and the worker that drains it.
+
+Matched notifications are written to the ``notification_outbox`` table instead
+of being sent inline by the poller. A sender task in each worker claims due
+rows in batches, sends them with bounded concurrency through the rate-limit-aware
+Discord client, and writes the outcome of the whole batch back at once:
+
+* sent            → row deleted
+* rate limited    → rescheduled after Discord's ``retry_after``, attempt not counted
+* transient error → rescheduled with exponential backoff
+* permanent error → (4xx, or too many attempts) marked "failed" and kept for inspection
+
+A user in digest mode gets compact entries instead of full messages; the
+sender packs all of one user's due entries into as few DMs as fit
+Discord's 2,000-character limit.
+
+On shutdown the sender finishes the batch it is working on, records its
+results, and only then exits.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, run_db
+from app.models import OutboxMessage
+from app.services import metrics
+from app.services.discord import DiscordRateLimited, send_dm
+
+logger = logging.getLogger(__name__)
+
+# Discord rejects message content longer than this
+_MESSAGE_LIMIT = 2000
+# Reserved for the "🔔 N new issues" line on top of each digest message
+_DIGEST_HEADER_ROOM = 40
+
+_task: asyncio.Task | None = None
+_wake: asyncio.Event | None = None
+_stopping = False
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue(db: Session, messages: list[tuple[str, str]], digest: bool = False) -> None:
+    """Stage (discord_id, content) messages on *db*; the caller commits, then calls wake().
+
+    Digest entries are held back DIGEST_DELAY seconds so the rest of the
+    cycle's matches can join them in the same DMs.
+    """
+    if not messages:
+        return
+    due = _utcnow()
+    if digest:
+        due += timedelta(seconds=settings.digest_delay)
+    db.execute(
+        insert(OutboxMessage),
+        [
+            {"discord_id": discord_id, "content": content, "digest": digest, "next_attempt_at": due}
+            for discord_id, content in messages
+        ],
+    )
+
+
+def wake() -> None:
+    """Tell a running sender that new rows are waiting."""
+    if _wake is not None:
+        _wake.set()
+
+
+def _claim_batch() -> list[tuple[int, str, str, int, bool]]:
+    """Take up to a batch of due rows for this sender.
+
+    Claimed rows are pushed OUTBOX_CLAIM_TIMEOUT into the future in the same
+    transaction, so other senders skip them — and pick them up again if this
+    one dies before recording the outcome. SKIP LOCKED keeps concurrent
+    claims on PostgreSQL from waiting on each other (SQLite ignores it).
+    """
+    db: Session = SessionLocal()
+    try:
+        now = _utcnow()
+        rows = db.execute(
+            select(
+                OutboxMessage.id,
+                OutboxMessage.discord_id,
+                OutboxMessage.content,
+                OutboxMessage.attempts,
+                OutboxMessage.digest,
+            )
+            .where(
+                OutboxMessage.status == "pending",
+                OutboxMessage.next_attempt_at <= now,
+            )
+            .order_by(OutboxMessage.id)
+            .limit(settings.outbox_batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if rows:
+            db.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_([row.id for row in rows]))
+                .values(next_attempt_at=now + timedelta(seconds=settings.outbox_claim_timeout))
+            )
+        db.commit()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+def _record_results(sent: list[int], retries: list[dict], failed: list[dict]) -> None:
+    """Write a whole batch's outcome in one transaction."""
+    db: Session = SessionLocal()
+    try:
+        if sent:
+            db.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(sent)))
+        if retries:
+            db.execute(update(OutboxMessage), retries)
+        if failed:
+            db.execute(update(OutboxMessage), failed)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _backlog() -> dict[tuple[str, ...], float]:
+    db: Session = SessionLocal()
+    try:
+        rows = db.execute(
+            select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+        ).all()
+    finally:
+        db.close()
+    counts = {("pending",): 0, ("failed",): 0}
+    counts.update({(status,): count for status, count in rows})
+    return counts
+
+
+metrics.Gauge(
+    "issuebell_outbox_rows",
+    "Outbox rows waiting to be sent (pending) or given up on (failed).",
+    ("status",),
+    collect=_backlog,
+)
+
+
+def _backoff(attempts: int) -> timedelta:
+    seconds = settings.outbox_backoff_base * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.outbox_backoff_max))
+
+
+def _digest_message(entries: list[str]) -> str:
+    count = len(entries)
+    header = f"\U0001f514 **{count} new issue{'s' if count > 1 else ''}**"
+    return "\n".join([header, *entries])
+
+
+def _group(batch: list[tuple[int, str, str, int, bool]]) -> list[tuple[list[int], str, str, int]]:
+    """Turn claimed rows into (row ids, discord_id, content, attempts) deliveries.
+
+    Plain rows are delivered one each. A user's digest rows are packed, in
+    order, into as few messages as fit Discord's length limit; each message
+    carries the ids of the rows it contains.
+    """
+    deliveries: list[tuple[list[int], str, str, int]] = []
+    digests: dict[str, list[tuple[int, str, int]]] = {}
+    for row_id, discord_id, content, attempts, digest in batch:
+        if digest:
+            digests.setdefault(discord_id, []).append((row_id, content, attempts))
+        else:
+            deliveries.append(([row_id], discord_id, content, attempts))
+
+    def flush(discord_id: str, chunk: list[tuple[int, str, int]]) -> None:
+        deliveries.append((
+            [row_id for row_id, _, _ in chunk],
+            discord_id,
+            _digest_message([content for _, content, _ in chunk]),
+            max(attempts for _, _, attempts in chunk),
+        ))
+
+    for discord_id, rows in digests.items():
+        chunk: list[tuple[int, str, int]] = []
+        size = 0
+        for row in rows:
+            if chunk and size + len(row[1]) + 1 > _MESSAGE_LIMIT - _DIGEST_HEADER_ROOM:
+                flush(discord_id, chunk)
+                chunk, size = [], 0
+            chunk.append(row)
+            size += len(row[1]) + 1
+        flush(discord_id, chunk)
+    return deliveries
+
+
+async def _send_batch(batch: list[tuple[int, str, str, int, bool]]) -> None:
+    sent: list[int] = []
+    retries: list[dict] = []
+    failed: list[dict] = []
+    semaphore = asyncio.Semaphore(settings.poll_send_concurrency)
+
+    async def deliver(row_ids: list[int], discord_id: str, content: str, attempts: int) -> None:
+        async with semaphore:
+            try:
+                await send_dm(discord_id, content)
+                sent.extend(row_ids)
+                return
+            except DiscordRateLimited as exc:
+                retries.extend({
+                    "id": row_id,
+                    "next_attempt_at": _utcnow() + timedelta(seconds=exc.retry_after),
+                    "last_error": str(exc),
+                } for row_id in row_ids)
+                return
+            except httpx.HTTPStatusError as exc:
+                # 4xx (blocked DMs, unknown user, ...) won't fix itself by retrying.
+                permanent = exc.response.status_code < 500
+                error = f"HTTP {exc.response.status_code}"
+            except Exception as exc:
+                permanent = False
+                error = str(exc) or type(exc).__name__
+
+            attempts += 1
+            if permanent or attempts >= settings.outbox_max_attempts:
+                logger.warning("DM to %s failed permanently: %s", discord_id, error)
+                failed.extend({
+                    "id": row_id, "status": "failed", "attempts": attempts, "last_error": error,
+                } for row_id in row_ids)
+            else:
+                logger.info("DM to %s failed (attempt %d): %s", discord_id, attempts, error)
+                retries.extend({
+                    "id": row_id,
+                    "attempts": attempts,
+                    "next_attempt_at": _utcnow() + _backoff(attempts),
+                    "last_error": error,
+                } for row_id in row_ids)
+
+    await asyncio.gather(*(deliver(*delivery) for delivery in _group(batch)))
+    metrics.outbox_deliveries.inc(len(sent), outcome="sent")
+    metrics.outbox_deliveries.inc(len(retries), outcome="retry")
+    metrics.outbox_deliveries.inc(len(failed), outcome="failed")
+    await run_db(_record_results, sent, retries, failed)
+
+
+async def _run() -> None:
+    while not _stopping:
+        # Cleared before claiming, so a wake() during the claim isn't lost.
+        _wake.clear()
+        try:
+            batch = await run_db(_claim_batch)
+            if batch:
+                await _send_batch(batch)
+                continue
+        except Exception as exc:
+            logger.error("Outbox sender error: %s", exc, exc_info=True)
+        # Nothing due: sleep until woken by new rows or the next idle check.
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=settings.outbox_idle_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start() -> None:
+    """Start the sender task on the running event loop."""
+    global _task, _wake, _stopping
+    _stopping = False
+    _wake = asyncio.Event()
+    _task = asyncio.create_task(_run(), name="outbox-sender")
+    logger.info("Outbox sender started")
+
+
+async def stop(timeout: float) -> None:
+    """Let the sender finish its in-flight batch, then stop it."""
+    global _task, _stopping
+    if _task is None:
+        return
+    _stopping = True
+    wake()
+    try:
+        await asyncio.wait_for(asyncio.shield(_task), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Outbox sender did not drain within %.0fs; cancelling", timeout)
+        _task.cancel()
+    _task = None
+    logger.info("Outbox sender stopped")
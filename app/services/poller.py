@@ -0,0 +1,609 @@
+"""Repo-centric polling engine.
+
+Every unique repository is fetched once per cycle with a single eligible token,
+and the resulting issues are fanned out to all of that repo's subscribers.
+
+A cycle runs as a three-stage asyncio pipeline connected by bounded queues:
+
+    fetch workers  →  match workers  →  outbox writer  ⇢  outbox sender
+    (GitHub)          (label regex)     (ledger + batched  (Discord DMs,
+                                         DB inserts)        see ``outbox``)
+
+Each stage has its own concurrency limit, so a slow repo only occupies one
+worker instead of stalling the whole cycle. DMs are not sent inline: matched
+notifications are written to the durable outbox and delivered by its sender.
+
+Fetch workers use the REST issues endpoint, one repo at a time, or with
+GITHUB_BACKEND=graphql one aliased query per batch of repos sharing a token
+(see ``github_graphql``); repos GraphQL can't settle fall back to REST.
+
+Repos with a live GitHub webhook (see ``push``) are only polled every
+POLL_MAX_INTERVAL. Every DM is claimed in the notification ledger before it
+is queued, so re-finding an issue (after a crash, from a webhook, on
+another worker) never notifies anyone twice.
+
+With several worker replicas, each polls only the repos in the hash slots
+it holds (see ``shards``).
+
+The scheduler calls ``poll_all_users`` every POLL_TICK seconds, but only repos
+whose adaptive cadence says they are due are fetched (see ``cadence``), and
+only while a token has rate-limit budget left for this tick (see
+``ratelimit``) — a subscriber's, or for a confirmed-public repo anyone's (see
+``tokens`` and ``visibility``).
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, run_db
+from app.models import Subscription, User
+from app.services import (
+    cadence,
+    cursors,
+    etag_cache,
+    github_graphql,
+    ledger,
+    metrics,
+    outbox,
+    push,
+    shards,
+    subscription_index,
+    tokens,
+    visibility,
+)
+from app.services.github import (
+    build_digest_entry,
+    build_issue_message,
+    is_public_repo,
+    issue_created_at,
+    iter_new_issues,
+    newest_cursor,
+    take_new_issues,
+)
+from app.services.ratelimit import RateLimited
+
+logger = logging.getLogger(__name__)
+
+# Repos seen on the previous tick, so cadence state of dropped repos can be freed.
+_known_repos: set[str] = set()
+# Repos per checkpoint UPDATE — keeps the CASE and IN lists a sane size.
+_CHECKPOINT_CHUNK = 500
+# The cycle currently running, so shutdown can wait for it.
+_running_cycle: asyncio.Task | None = None
+# Pipeline stage → its queue while a cycle runs (read by the metrics scrape).
+_queues: dict[str, asyncio.Queue] = {}
+
+metrics.Gauge(
+    "issuebell_pipeline_queue_depth",
+    "Items waiting in each poll pipeline queue (empty between cycles).",
+    ("stage",),
+    collect=lambda: {
+        (stage,): _queues[stage].qsize() if stage in _queues else 0
+        for stage in ("fetch", "match", "outbox")
+    },
+)
+
+
+@dataclass(slots=True)
+class Recipient:
+    """A user with a connected GitHub account — eligible to poll and be notified."""
+
+    discord_id: str
+    # None once GitHub has rejected it: still notified, but not polled with
+    token: str | None
+    digest: bool
+
+
+@dataclass(slots=True)
+class RepoJob:
+    """One repository to poll this cycle."""
+
+    repo: str
+    token: str
+    # The token belongs to a non-subscriber (see ``tokens``)
+    borrowed: bool
+    # Issues numbered above the cursor are new to every subscriber.
+    cursor: cursors.Cursor | None
+    # Repos without a cursor yet: the oldest checkpoint bounds the window
+    # every subscriber needs.
+    since: datetime | None
+
+
+def _load_recipients() -> dict[int, Recipient]:
+    """Load every user with a GitHub token, and make sure the in-memory state is ready."""
+    if shards.rebalance():
+        # Newly held repos were polled by another worker until now.
+        etag_cache.invalidate()
+        cursors.invalidate()
+        visibility.invalidate()
+    db: Session = SessionLocal()
+    try:
+        etag_cache.load(db)
+        cursors.load(db)
+        visibility.load(db)
+        push.refresh(db)
+        subscription_index.sync(db)
+        rows = db.execute(
+            select(
+                User.id,
+                User.discord_id,
+                User.github_token,
+                User.github_token_revoked_at,
+                User.digest_mode,
+            )
+            .where(User.github_token.isnot(None))
+            .execution_options(yield_per=1000)
+        )
+        return {
+            user_id: Recipient(discord_id, None if revoked_at else token, digest)
+            for user_id, discord_id, token, revoked_at, digest in rows
+        }
+    finally:
+        db.close()
+
+
+def _job(repo: str, token: str, borrowed: bool, user_ids: set[int]) -> RepoJob:
+    cursor = cursors.get(repo)
+    since = None if cursor else subscription_index.oldest_checkpoint(repo, user_ids)
+    return RepoJob(repo, token, borrowed, cursor, since)
+
+
+def _plan(
+    subscribed: dict[str, set[int]],
+    recipients: dict[int, Recipient],
+    now: float,
+) -> list[list[RepoJob]]:
+    """Pick the repos due this tick, most overdue first, and a token for each.
+
+    Returns fetch-queue items: one job per item for REST, batches sharing a
+    token for GraphQL (see ``_plan_batches``). Each repo gets its subscribers'
+    healthiest token, or failing that, unless the repo is known not to be
+    public, the healthiest token of anyone (which checks the repo is public
+    before fetching anything). Repos no token has budget for stay due and are
+    retried on a later tick, which spreads each token's calls across its
+    reset window.
+    """
+    due = [
+        repo for repo in subscribed if shards.owns(repo) and cadence.overdue(repo, now) >= 0
+    ]
+    due.sort(key=lambda repo: cadence.overdue(repo, now), reverse=True)
+    pollers = {uid: recipient.token for uid, recipient in recipients.items() if recipient.token}
+    if settings.github_backend == "graphql":
+        return _plan_batches(due, subscribed, recipients, pollers, now)
+    allowances = tokens.Allowances(pollers.values(), now)
+    planned: list[list[RepoJob]] = []
+    for repo in due:
+        user_ids = subscribed[repo] & recipients.keys()
+        if not user_ids:
+            continue
+        token = allowances.pick(pollers[uid] for uid in sorted(user_ids) if uid in pollers)
+        borrowed = token is None
+        if borrowed and visibility.may_borrow(repo):
+            token = allowances.borrow()
+        if token is None:
+            continue
+        planned.append([_job(repo, token, borrowed, user_ids)])
+    return planned
+
+
+def _plan_batches(
+    due: list[str],
+    subscribed: dict[str, set[int]],
+    recipients: dict[int, Recipient],
+    pollers: dict[int, str],
+    now: float,
+) -> list[list[RepoJob]]:
+    """Group the due repos into GraphQL batches of up to GITHUB_GRAPHQL_BATCH_SIZE, one token each.
+
+    A query costs the same whatever it asks for, so the batches are planned
+    first and each is charged once to a token that can serve all of it:
+
+    - confirmed-public repos are batched as they come and take the pool's
+      healthiest token;
+    - the rest go, greedily, to whichever subscriber token still covers the
+      most of them;
+    - repos no subscriber token could take are borrowed for one at a time,
+      unless known not to be public — the REST walk checks them first.
+    """
+    size = settings.github_graphql_batch_size
+    allowances = tokens.Allowances(pollers.values(), now, "graphql")
+    user_ids: dict[str, set[int]] = {}
+    # Repo → its subscribers' tokens
+    owners: dict[str, set[str]] = {}
+    shared: list[str] = []
+    own: dict[str, list[str]] = {}
+    for repo in due:
+        ids = subscribed[repo] & recipients.keys()
+        if not ids:
+            continue
+        user_ids[repo] = ids
+        owners[repo] = {pollers[uid] for uid in ids if uid in pollers}
+        if visibility.is_public(repo):
+            shared.append(repo)
+            continue
+        for token in owners[repo]:
+            own.setdefault(token, []).append(repo)
+
+    planned: list[list[RepoJob]] = []
+    assigned: set[str] = set()
+
+    def add(token: str, repos: list[str]) -> None:
+        assigned.update(repos)
+        planned.append(
+            [_job(repo, token, token not in owners[repo], user_ids[repo]) for repo in repos]
+        )
+
+    for start in range(0, len(shared), size):
+        token = allowances.borrow()
+        if token is None:
+            break
+        add(token, shared[start:start + size])
+
+    # Lazy greedy cover: counts go stale as other tokens take repos and are
+    # refreshed when popped.
+    heap = [(-len(repos), token) for token, repos in own.items()]
+    heapq.heapify(heap)
+    while heap:
+        stored, token = heapq.heappop(heap)
+        repos = own[token] = [repo for repo in own[token] if repo not in assigned]
+        if not repos:
+            continue
+        if len(repos) != -stored:
+            heapq.heappush(heap, (-len(repos), token))
+            continue
+        if allowances.pick([token]) is None:
+            continue
+        add(token, repos[:size])
+        if len(repos) > size:
+            heapq.heappush(heap, (-(len(repos) - size), token))
+
+    for repo in user_ids:
+        if repo in assigned or visibility.is_public(repo) or not visibility.may_borrow(repo):
+            continue
+        token = allowances.borrow()
+        if token is None:
+            break
+        add(token, [repo])
+    return planned
+
+
+def _write_checkpoints(checkpoints: dict[str, datetime]) -> None:
+    """Bump last_checked_at for every subscription of each successfully polled repo.
+
+    The whole cycle is written in one transaction: one UPDATE per chunk of
+    repos (a CASE picks each repo's timestamp) plus one validator and one
+    cursor upsert, so a cached ETag or cursor is never persisted without the
+    checkpoint that covers it. Repo visibility changes are written alongside.
+    """
+    db: Session = SessionLocal()
+    try:
+        repos = list(checkpoints)
+        for start in range(0, len(repos), _CHECKPOINT_CHUNK):
+            chunk = {repo: checkpoints[repo] for repo in repos[start:start + _CHECKPOINT_CHUNK]}
+            db.execute(
+                update(Subscription)
+                .where(Subscription.repo_full_name.in_(chunk))
+                .values(last_checked_at=case(chunk, value=Subscription.repo_full_name))
+            )
+        etag_cache.flush(db)
+        cursors.flush(db)
+        visibility.flush(db)
+        db.commit()
+    finally:
+        db.close()
+    for repo, checked_at in checkpoints.items():
+        subscription_index.mark_checked(repo, checked_at)
+
+
+def _match_issues(
+    job: RepoJob,
+    issues: list[dict],
+    recipients: dict[int, Recipient],
+) -> list[tuple[ledger.Key, str, str, bool]]:
+    """Return (ledger key, discord_id, message, digest) for every subscriber an issue should reach."""
+    messages: list[tuple[ledger.Key, str, str, bool]] = []
+    for issue in issues:
+        number = issue["number"]
+        created_at = issue_created_at(issue)
+        matches = subscription_index.match(
+            job.repo,
+            [lb["name"] for lb in issue.get("labels", [])],
+            # Past the repo's cursor means new to every subscriber, old or new;
+            # only a repo's first walk goes by each subscription's checkpoint.
+            # Users recently notified of this issue (e.g. by its webhook) are skipped.
+            accept=lambda sub: sub.user_id in recipients
+            and (job.cursor is not None or sub.is_new(created_at))
+            and not ledger.seen((sub.user_id, job.repo, number)),
+        )
+        # `match` yields at most ONE subscription per user, and the ledger
+        # drops repeats, so each user gets at most one DM per issue.
+        for user_id, (_, matched_label) in matches.items():
+            recipient = recipients[user_id]
+            build = build_digest_entry if recipient.digest else build_issue_message
+            messages.append(
+                (
+                    (user_id, job.repo, number),
+                    recipient.discord_id,
+                    build(issue, job.repo, matched_label),
+                    recipient.digest,
+                )
+            )
+    return messages
+
+
+def _record_poll(repo: str, new_issues: int) -> None:
+    metrics.poll_repos.inc(outcome="ok")
+    metrics.github_fetch_issues.observe(new_issues)
+    cadence.record_poll(repo, new_issues)
+    if push.is_covered(repo):
+        # Webhooks deliver this repo's issues; polling is only a safety net.
+        cadence.defer(repo, time.time() + settings.poll_max_interval)
+
+
+async def _fetch_rest(
+    job: RepoJob,
+    match_queue: asyncio.Queue,
+    checkpoints: dict[str, datetime],
+) -> None:
+    timer = time.perf_counter()
+    try:
+        if job.borrowed and not visibility.is_public(job.repo):
+            # A lent token's owner may be a member of a private repo, so it
+            # only reads the issues once GitHub says the repo is public.
+            public = await is_public_repo(job.repo, job.token)
+            visibility.record(job.repo, public)
+            if not public:
+                logger.info("%s is not public; polling it with subscribers' tokens only", job.repo)
+                metrics.poll_repos.inc(outcome="unavailable")
+                return
+        # Anything created after the walk starts is left for the next poll.
+        started = datetime.now(timezone.utc).replace(tzinfo=None)
+        found = 0
+        # Pages are matched as they arrive instead of after the last one.
+        async for issues in iter_new_issues(job.repo, job.token, job.since, job.cursor):
+            found += len(issues)
+            await match_queue.put((job, issues))
+        checkpoints[job.repo] = started
+        _record_poll(job.repo, found)
+        metrics.github_fetch_seconds.observe(time.perf_counter() - timer)
+    except RateLimited as exc:
+        logger.warning("Polling %s rate limited: %s", job.repo, exc)
+        metrics.poll_repos.inc(outcome="rate_limited")
+        cadence.defer(job.repo, exc.retry_at)
+    except tokens.TokenRevoked as exc:
+        # The repo stays due and gets another token next tick.
+        logger.warning("Polling %s: %s", job.repo, exc)
+        metrics.poll_repos.inc(outcome="token_revoked")
+        await run_db(tokens.revoke, exc.token)
+    except tokens.RepoUnavailable as exc:
+        metrics.poll_repos.inc(outcome="unavailable")
+        # Whoever's token it was, the repo isn't one to lend tokens to.
+        visibility.record(job.repo, False)
+        if not job.borrowed:
+            logger.info("Polling %s: %s", job.repo, exc)
+            cadence.defer(job.repo, time.time() + cadence.get(job.repo).interval)
+    except Exception as exc:
+        logger.warning("Polling %s failed: %s", job.repo, exc)
+        metrics.poll_repos.inc(outcome="failed")
+        # Don't retry a failing repo on every tick.
+        cadence.defer(job.repo, time.time() + cadence.get(job.repo).interval)
+
+
+async def _fetch_graphql(
+    jobs: list[RepoJob],
+    match_queue: asyncio.Queue,
+    checkpoints: dict[str, datetime],
+) -> list[RepoJob]:
+    """Poll *jobs* (all sharing one token) with a single GraphQL query.
+
+    The answer also says which repos are public, which keeps ``visibility``
+    current for the next tick's batches. Returns the jobs it could not
+    settle — failed repos, repos with more new issues than one query
+    returns, and borrowed-token repos not yet confirmed public (the REST
+    walk checks those first) — for the REST walk to handle.
+    """
+    unconfirmed = [job for job in jobs if job.borrowed and not visibility.is_public(job.repo)]
+    if unconfirmed:
+        jobs = [job for job in jobs if job not in unconfirmed]
+        if not jobs:
+            return unconfirmed
+    started = datetime.now(timezone.utc).replace(tzinfo=None)
+    try:
+        results, public = await github_graphql.fetch_newest_issues(
+            jobs[0].token, [job.repo for job in jobs]
+        )
+    except tokens.TokenRevoked as exc:
+        # The repos stay due and get other tokens next tick.
+        logger.warning("GraphQL poll of %d repos: %s", len(jobs), exc)
+        await run_db(tokens.revoke, exc.token)
+        return unconfirmed
+    except Exception as exc:
+        logger.warning("GraphQL poll of %d repos failed, using REST: %s", len(jobs), exc)
+        return jobs + unconfirmed
+
+    leftovers: list[RepoJob] = unconfirmed
+    for job in jobs:
+        if job.repo in public and visibility.is_public(job.repo) != public[job.repo]:
+            visibility.record(job.repo, public[job.repo])
+        items = results.get(job.repo)
+        if items is None:
+            leftovers.append(job)
+            continue
+        if job.borrowed and not public[job.repo]:
+            # Went private since it was confirmed public: not this token's to read.
+            logger.info("%s is not public; polling it with subscribers' tokens only", job.repo)
+            metrics.poll_repos.inc(outcome="unavailable")
+            continue
+        issues, reached = take_new_issues(items, job.since, job.cursor)
+        # A full page without the boundary may hide older new issues; a repo's
+        # first poll (no cursor, no checkpoint) only ever wants one page.
+        complete = (
+            reached
+            or len(items) < settings.github_graphql_issues_per_repo
+            or (job.cursor is None and job.since is None)
+        )
+        if not complete:
+            leftovers.append(job)
+            continue
+        if issues:
+            await match_queue.put((job, issues))
+        if (newest := newest_cursor(items)) is not None:
+            cursors.advance(job.repo, newest)
+        checkpoints[job.repo] = started
+        _record_poll(job.repo, len(issues))
+    return leftovers
+
+
+async def _fetch_worker(
+    fetch_queue: asyncio.Queue,
+    match_queue: asyncio.Queue,
+    checkpoints: dict[str, datetime],
+) -> None:
+    while True:
+        jobs: list[RepoJob] = await fetch_queue.get()
+        try:
+            if settings.github_backend == "graphql":
+                jobs = await _fetch_graphql(jobs, match_queue, checkpoints)
+            for job in jobs:
+                await _fetch_rest(job, match_queue, checkpoints)
+        finally:
+            fetch_queue.task_done()
+
+
+async def _match_worker(
+    match_queue: asyncio.Queue,
+    outbox_queue: asyncio.Queue,
+    recipients: dict[int, Recipient],
+) -> None:
+    while True:
+        job, issues = await match_queue.get()
+        try:
+            messages = _match_issues(job, issues, recipients)
+            metrics.notifications_matched.inc(len(messages), source="poll")
+            for message in messages:
+                await outbox_queue.put(message)
+        except Exception as exc:
+            logger.warning("Matching issues for %s failed: %s", job.repo, exc)
+        finally:
+            match_queue.task_done()
+
+
+def _write_outbox(messages: list[tuple[ledger.Key, str, str, bool]]) -> int:
+    db: Session = SessionLocal()
+    try:
+        claimed = ledger.enqueue(db, messages)
+        db.commit()
+    finally:
+        db.close()
+    ledger.remember(claimed)
+    metrics.notifications_queued.inc(len(claimed), source="poll")
+    return len(claimed)
+
+
+async def _outbox_writer(outbox_queue: asyncio.Queue) -> None:
+    """Insert matched notifications into the outbox, batching whatever is queued."""
+    while True:
+        messages = [await outbox_queue.get()]
+        while not outbox_queue.empty():
+            messages.append(outbox_queue.get_nowait())
+        try:
+            if await run_db(_write_outbox, messages):
+                outbox.wake()
+        except Exception as exc:
+            logger.error("Writing %d notifications to the outbox failed: %s", len(messages), exc)
+        finally:
+            for _ in messages:
+                outbox_queue.task_done()
+
+
+async def _run_pipeline(
+    batches: list[list[RepoJob]],
+    recipients: dict[int, Recipient],
+) -> dict[str, datetime]:
+    """Push *batches* through the fetch → match → outbox stages and wait for them to drain."""
+    fetch_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.poll_queue_size)
+    match_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.poll_queue_size)
+    outbox_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.poll_queue_size)
+    checkpoints: dict[str, datetime] = {}
+    _queues.update(fetch=fetch_queue, match=match_queue, outbox=outbox_queue)
+
+    workers = [
+        *(
+            asyncio.create_task(_fetch_worker(fetch_queue, match_queue, checkpoints))
+            for _ in range(settings.poll_fetch_concurrency)
+        ),
+        *(
+            asyncio.create_task(_match_worker(match_queue, outbox_queue, recipients))
+            for _ in range(settings.poll_match_concurrency)
+        ),
+        asyncio.create_task(_outbox_writer(outbox_queue)),
+    ]
+    try:
+        for batch in batches:
+            await fetch_queue.put(batch)
+        # Each stage only feeds the next one, so draining them in order is enough.
+        await fetch_queue.join()
+        await match_queue.join()
+        await outbox_queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        _queues.clear()
+    return checkpoints
+
+
+async def poll_all_users() -> None:
+    """Check every subscribed repository that is due and notify matching subscribers."""
+    global _known_repos, _running_cycle
+    _running_cycle = asyncio.current_task()
+    try:
+        recipients = await run_db(_load_recipients)
+        subscribed = subscription_index.repos()
+        cadence.forget(_known_repos - subscribed.keys())
+        cursors.retain(subscribed.keys())
+        visibility.retain(subscribed.keys())
+        _known_repos = set(subscribed)
+
+        # Planning walks every due repo and every token: keep it off the loop too.
+        planned = await run_db(_plan, subscribed, recipients, time.time())
+        if not planned:
+            return
+        started = asyncio.get_running_loop().time()
+        checkpoints = await _run_pipeline(planned, recipients)
+        await run_db(_write_checkpoints, checkpoints)
+        elapsed = asyncio.get_running_loop().time() - started
+        metrics.poll_cycle_seconds.observe(elapsed)
+        if elapsed > settings.poll_tick:
+            metrics.poll_cycle_overruns.inc()
+        logger.info(
+            "Poll cycle: %d/%d due repos checked (%d subscribed) in %.1fs",
+            len(checkpoints),
+            sum(len(batch) for batch in planned),
+            len(subscribed),
+            elapsed,
+        )
+    except Exception as exc:
+        logger.error("poll_all_users crashed: %s", exc, exc_info=True)
+    finally:
+        _running_cycle = None
+
+
+async def drain(timeout: float) -> None:
+    """Wait for an in-flight poll cycle to finish; cancel it after *timeout* seconds."""
+    task = _running_cycle
+    if task is None or task.done():
+        return
+    try:
+        await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Poll cycle did not finish within %.0fs; cancelling", timeout)
+        task.cancel()
@@ -0,0 +1,91 @@
+"""Push-based fast path: issue events delivered by GitHub webhooks.
+
+An ``issues`` event is matched against the subscription index and queued in
+the notification outbox (through the ledger) exactly like an issue the poller
+found, just minutes sooner. Every delivery also marks its repo as push-covered; the poller keeps
+polling covered repos, but only every POLL_MAX_INTERVAL as a safety net for
+missed deliveries.
+
+Coverage is stored in ``webhook_repos`` so it survives restarts and lapses
+on its own once a repo's webhook goes quiet for GITHUB_WEBHOOK_COVERAGE_TTL.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import dialect_insert
+from app.models import User, WebhookRepo
+from app.services import ledger, metrics, subscription_index
+from app.services.github import build_digest_entry, build_issue_message
+
+_lock = threading.Lock()
+_covered: set[str] = set()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def record_delivery(db: Session, repo: str) -> None:
+    """Mark *repo* as push-covered as of now; the caller commits."""
+    stmt = dialect_insert(WebhookRepo).values(repo_full_name=repo, last_delivery_at=_utcnow())
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[WebhookRepo.repo_full_name],
+            set_={"last_delivery_at": stmt.excluded.last_delivery_at},
+        )
+    )
+    with _lock:
+        _covered.add(repo)
+
+
+def refresh(db: Session) -> None:
+    """Reload the set of repos with a recent webhook delivery."""
+    cutoff = _utcnow() - timedelta(seconds=settings.github_webhook_coverage_ttl)
+    covered = set(
+        db.scalars(
+            select(WebhookRepo.repo_full_name).where(WebhookRepo.last_delivery_at >= cutoff)
+        )
+    )
+    with _lock:
+        _covered.clear()
+        _covered.update(covered)
+
+
+def is_covered(repo: str) -> bool:
+    with _lock:
+        return repo in _covered
+
+
+def queue_issue(db: Session, repo: str, issue: dict, labels: list[str]) -> set[ledger.Key]:
+    """Stage DMs on *db* for every subscriber whose pattern matches one of *labels*.
+
+    *issue* is the webhook's REST-shaped issue object. Like the poller, only
+    users with a connected GitHub account are notified, and only once per
+    issue (the ledger drops repeats). Returns the claimed ledger keys; the
+    caller commits, then calls ledger.remember() and outbox.wake().
+    """
+    subscription_index.sync(db)
+    number = issue["number"]
+    matches = subscription_index.match(
+        repo, labels, accept=lambda sub: not ledger.seen((sub.user_id, repo, number))
+    )
+    if not matches:
+        return set()
+    rows = db.execute(
+        select(User.id, User.discord_id, User.digest_mode).where(
+            User.id.in_(matches), User.github_token.isnot(None)
+        )
+    )
+    notifications = []
+    for user_id, discord_id, digest in rows:
+        build = build_digest_entry if digest else build_issue_message
+        notifications.append(
+            ((user_id, repo, number), discord_id, build(issue, repo, matches[user_id][1]), digest)
+        )
+    metrics.notifications_matched.inc(len(notifications), source="webhook")
+    return ledger.enqueue(db, notifications)
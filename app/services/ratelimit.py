@@ -0,0 +1,125 @@
+"""GitHub rate-limit bookkeeping, per token and rate-limit resource.
+
+Every GitHub response carries ``X-RateLimit-Remaining`` / ``X-RateLimit-Reset``.
+We keep the latest values for each token and use them to spread that token's
+remaining calls evenly across its reset window, and to park a token entirely
+after a primary (remaining = 0) or secondary (``Retry-After``) rate limit.
+
+REST ("core") and GraphQL ("graphql", counted in points rather than calls)
+are separate budgets on GitHub's side, so they are tracked separately here.
+"""
+
+import hashlib
+import math
+import time
+from dataclasses import dataclass
+
+from httpx import Headers
+
+from app.services import metrics
+
+
+class RateLimited(Exception):
+    """GitHub refused the request for rate-limit reasons; retry after *retry_at*."""
+
+    def __init__(self, retry_at: float) -> None:
+        super().__init__(f"rate limited until {retry_at:.0f}")
+        self.retry_at = retry_at
+
+
+@dataclass(slots=True)
+class TokenBudget:
+    limit: int | None = None
+    remaining: int | None = None
+    # Epoch seconds at which `remaining` refills to `limit`
+    reset_at: float = 0.0
+    # Epoch seconds before which the token must not be used at all
+    blocked_until: float = 0.0
+
+    def update(self, headers: Headers) -> None:
+        """Record the rate-limit headers of a GitHub response."""
+        try:
+            if "X-RateLimit-Limit" in headers:
+                self.limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Remaining" in headers:
+                self.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Reset" in headers:
+                self.reset_at = float(headers["X-RateLimit-Reset"])
+        except ValueError:
+            pass
+
+    def block(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+
+    def allowance(self, horizon: float, now: float | None = None) -> int | None:
+        """How many calls this token may make in the next *horizon* seconds.
+
+        None means "no known limit" (no response seen yet, or the window reset).
+        """
+        now = time.time() if now is None else now
+        if now < self.blocked_until:
+            return 0
+        if self.remaining is None or now >= self.reset_at:
+            return None
+        if self.remaining <= 0:
+            return 0
+        # Fair share of what is left, spread evenly over the rest of the window.
+        share = self.remaining * horizon / (self.reset_at - now)
+        return max(1, math.floor(share))
+
+
+_budgets: dict[str, TokenBudget] = {}
+
+metrics.Gauge(
+    "issuebell_github_rate_remaining",
+    "Calls (core) or points (graphql) left in each token's current rate-limit window.",
+    ("resource", "token"),
+    collect=lambda: {
+        tuple(key.split(":", 1)): budget.remaining
+        for key, budget in list(_budgets.items())
+        if budget.remaining is not None
+    },
+)
+
+
+def token_key(token: str) -> str:
+    """Stable, non-reversible identifier for a token (safe to log)."""
+    return hashlib.sha256(token.encode()).hexdigest()[:12]
+
+
+def budget_for(token: str, resource: str = "core") -> TokenBudget:
+    key = f"{resource}:{token_key(token)}"
+    budget = _budgets.get(key)
+    if budget is None:
+        budget = _budgets[key] = TokenBudget()
+    return budget
+
+
+def check_response(
+    token: str,
+    status_code: int,
+    headers: Headers,
+    resource: str = "core",
+) -> None:
+    """Update *token*'s budget from a response and raise RateLimited if it was throttled."""
+    budget = budget_for(token, resource)
+    budget.update(headers)
+    if status_code not in (403, 429):
+        return
+    now = time.time()
+    retry_after = headers.get("Retry-After")
+    if retry_after is not None:
+        # Secondary rate limit — GitHub tells us exactly how long to wait.
+        try:
+            wait = float(retry_after)
+        except ValueError:
+            wait = 60.0
+        budget.block(now + wait)
+        raise RateLimited(budget.blocked_until)
+    if budget.remaining == 0:
+        budget.block(budget.reset_at)
+        raise RateLimited(budget.blocked_until)
+    if status_code == 429:
+        # Throttled without guidance: the docs ask for at least a minute.
+        budget.block(now + 60)
+        raise RateLimited(budget.blocked_until)
@@ -0,0 +1,329 @@
+"""Linear-time matching for subscription label patterns.
+
+Python's ``re`` backtracks, so a pattern such as ``(a+)+$`` can take
+exponential time on a short label and would stall the event loop for every
+user. Patterns are instead parsed with ``re``'s own parser and compiled into
+a Thompson NFA that is simulated as a lazily built DFA: each label character
+costs one dict lookup once a transition has been seen, and at most one pass
+over the NFA before that. Matching time is therefore bounded by
+len(label) × NFA size, whatever the pattern.
+
+The dialect is ``re`` minus the constructs that have no such bound:
+backreferences, lookarounds, conditionals, atomic groups, possessive
+quantifiers and word boundaries are rejected with ``UnsafePattern``, as are
+repetition counts and patterns too large to expand. Case-insensitive
+matching follows ``re``'s own per-character rules, which
+``scripts/safe_regex_check.py`` checks against ``re`` itself.
+
+Several patterns can share one automaton (``PatternSet``), so a repo's
+regexes are all tested in a single pass over each label.
+
+Parsing and case folding reuse CPython internals (``re._parser``,
+``re._constants``, ``re._casefix`` and ``_sre.unicode_tolower``), so that
+the dialect is exactly ``re``'s. They are private and may change between
+releases: importing this module fails loudly if one is missing, and
+``scripts/safe_regex_check.py`` has been run clean on CPython 3.11, 3.12
+and 3.13 (the Docker image's version).
+"""
+
+import _sre
+import functools
+import re
+import threading
+
+try:
+    from re import _casefix, _constants as _c, _parser
+
+    _c.MAXREPEAT, _c.ATOMIC_GROUP, _c.POSSESSIVE_REPEAT, _casefix._EXTRA_CASES
+    _parser.parse, _sre.unicode_tolower
+except (ImportError, AttributeError) as exc:  # pragma: no cover
+    raise ImportError(
+        f"safe_regex relies on CPython's re internals, which this Python lacks ({exc}); "
+        "run scripts/safe_regex_check.py on it and adapt the module"
+    ) from exc
+
+# Largest {m,n} bound accepted; repeats are expanded into copies of their body.
+_MAX_REPEAT = 100
+# NFA states per pattern — keeps both expansion and each DFA step cheap.
+_MAX_STATES = 2000
+# Cached DFA states per PatternSet before the cache is started over.
+_MAX_DFA_STATES = 4000
+# Distinct character predicates shared between all patterns.
+_MAX_PREDICATES = 4096
+
+_CHAR, _SPLIT, _AT_START, _AT_END, _MATCH = range(5)
+
+
+class UnsafePattern(ValueError):
+    """The pattern uses a construct that can't be matched in linear time."""
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+_CATEGORIES = {
+    _c.CATEGORY_DIGIT: str.isdecimal,
+    _c.CATEGORY_NOT_DIGIT: lambda ch: not ch.isdecimal(),
+    _c.CATEGORY_SPACE: str.isspace,
+    _c.CATEGORY_NOT_SPACE: lambda ch: not ch.isspace(),
+    _c.CATEGORY_WORD: _is_word,
+    _c.CATEGORY_NOT_WORD: lambda ch: not _is_word(ch),
+    _c.CATEGORY_LINEBREAK: lambda ch: ch == "\n",
+    _c.CATEGORY_NOT_LINEBREAK: lambda ch: ch != "\n",
+}
+
+_UNSUPPORTED = {
+    _c.GROUPREF: "backreferences",
+    _c.GROUPREF_EXISTS: "conditional groups",
+    _c.ASSERT: "lookarounds",
+    _c.ASSERT_NOT: "lookarounds",
+    _c.ATOMIC_GROUP: "atomic groups",
+    _c.POSSESSIVE_REPEAT: "possessive quantifiers",
+}
+
+
+def _class_test(items: list) -> tuple[bool, list, list]:
+    """Split a parsed character class into (negated, member tests, category tests)."""
+    negated = False
+    tests = []
+    categories = []
+    for op, av in items:
+        if op is _c.NEGATE:
+            negated = True
+        elif op is _c.LITERAL:
+            tests.append(lambda ch, c=chr(av): ch == c)
+        elif op is _c.RANGE:
+            tests.append(lambda ch, lo=av[0], hi=av[1]: lo <= ord(ch) <= hi)
+        elif op is _c.CATEGORY:
+            categories.append(_CATEGORIES[av])
+        else:
+            raise UnsafePattern(f"unsupported character class item {op}")
+    return negated, tests, categories
+
+
+# Code point → the other code points that lowercase to it. Scanning every
+# code point takes ~0.1s, so it is built once, by ``warm_up`` in the
+# background or else on first use.
+_lowercased_from: dict[int, tuple[int, ...]] | None = None
+_lowercased_lock = threading.Lock()
+
+
+def _lowercase_preimages() -> dict[int, tuple[int, ...]]:
+    global _lowercased_from
+    with _lowercased_lock:
+        if _lowercased_from is None:
+            found: dict[int, list[int]] = {}
+            for code in range(0x110000):
+                lower = _sre.unicode_tolower(code)
+                if lower != code:
+                    found.setdefault(lower, []).append(code)
+            _lowercased_from = {lower: tuple(codes) for lower, codes in found.items()}
+    return _lowercased_from
+
+
+def warm_up() -> None:
+    """Build the case-folding table on a background thread.
+
+    Called at startup by processes that match labels, so the first
+    case-insensitive match doesn't build it on the event loop.
+    """
+    threading.Thread(target=_lowercase_preimages, name="safe-regex-warm-up", daemon=True).start()
+
+
+def _case_variants(ch: str) -> set[str]:
+    """Every character ``re`` treats as equal to *ch* under IGNORECASE.
+
+    ``re`` compares single code points by their simple lowercase mapping,
+    plus a few extra equivalences (``_casefix``), so e.g. K matches the
+    Kelvin sign and ß never matches "SS". ``str.lower``/``str.upper`` use
+    the full mappings, which can return several characters, and can't be
+    used here.
+    """
+    lower = _sre.unicode_tolower(ord(ch))
+    folds = (lower, *_casefix._EXTRA_CASES.get(lower, ()))
+    lowered_from = _lowercased_from or _lowercase_preimages()
+    variants = {ch}
+    for fold in folds:
+        variants.add(chr(fold))
+        variants.update(map(chr, lowered_from.get(fold, ())))
+    return variants
+
+
+def _predicate(negated: bool, tests: list, categories: list, ignore_case: bool):
+    def test(ch: str) -> bool:
+        variants = _case_variants(ch) if ignore_case else (ch,)
+        # Like ``re``, categories (\d, \w, …) only look at the lowercased character.
+        lowered = chr(_sre.unicode_tolower(ord(ch))) if ignore_case else ch
+        hit = any(t(v) for v in variants for t in tests) or any(t(lowered) for t in categories)
+        return hit is not negated
+
+    return test
+
+
+@functools.lru_cache(maxsize=_MAX_PREDICATES)
+def _char_predicate(op, av, flags: int):
+    """The predicate of one character-consuming item, shared by every pattern using it.
+
+    A repo's patterns are kept for as long as it is polled and mostly spell
+    the same few labels; sharing keeps their NFAs down to plain ints instead
+    of a closure per character, which the garbage collector would rescan on
+    every full collection.
+    """
+    ignore_case = bool(flags & re.IGNORECASE)
+    if op is _c.LITERAL or op is _c.NOT_LITERAL:
+        return _predicate(op is _c.NOT_LITERAL, [lambda ch, c=chr(av): ch == c], [], ignore_case)
+    if op is _c.ANY:
+        if flags & re.DOTALL:
+            return _predicate(False, [lambda ch: True], [], ignore_case)
+        return _predicate(True, [lambda ch: ch == "\n"], [], ignore_case)
+    return _predicate(*_class_test(av), ignore_case)
+
+
+class _Builder:
+    """Compiles parsed patterns into one NFA, built back to front."""
+
+    def __init__(self) -> None:
+        self.kind: list[int] = []
+        self.out: list[list[int]] = []
+        self.arg: list = []
+
+    def state(self, kind: int, out: list[int], arg=None) -> int:
+        self.kind.append(kind)
+        self.out.append(out)
+        self.arg.append(arg)
+        return len(self.kind) - 1
+
+    def sequence(self, items, out: int, flags: int, limit: int) -> int:
+        for op, av in reversed(list(items)):
+            out = self.item(op, av, out, flags, limit)
+            if len(self.kind) > limit:
+                raise UnsafePattern("pattern is too large")
+        return out
+
+    def item(self, op, av, out: int, flags: int, limit: int) -> int:
+        if op in (_c.LITERAL, _c.NOT_LITERAL, _c.ANY, _c.IN):
+            pred = _char_predicate(
+                op, tuple(av) if op is _c.IN else av, flags & (re.IGNORECASE | re.DOTALL)
+            )
+            return self.state(_CHAR, [out], pred)
+        if op is _c.BRANCH:
+            return self.state(_SPLIT, [self.sequence(alt, out, flags, limit) for alt in av[1]])
+        if op is _c.SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            return self.sequence(sub, out, (flags | add_flags) & ~del_flags, limit)
+        if op in (_c.MAX_REPEAT, _c.MIN_REPEAT):
+            lo, hi, sub = av
+            unbounded = hi == _c.MAXREPEAT
+            if lo > _MAX_REPEAT or (not unbounded and hi > _MAX_REPEAT):
+                raise UnsafePattern(f"repetition counts above {_MAX_REPEAT} are not supported")
+            if unbounded:
+                loop = self.state(_SPLIT, [])
+                self.out[loop] = [self.sequence(sub, loop, flags, limit), out]
+                out = loop
+            else:
+                for _ in range(hi - lo):
+                    out = self.state(_SPLIT, [self.sequence(sub, out, flags, limit), out])
+            for _ in range(lo):
+                out = self.sequence(sub, out, flags, limit)
+            return out
+        if op is _c.AT:
+            if av in (_c.AT_BEGINNING, _c.AT_BEGINNING_STRING):
+                return self.state(_AT_START, [out])
+            if av in (_c.AT_END, _c.AT_END_STRING):
+                return self.state(_AT_END, [out])
+            raise UnsafePattern("word boundaries (\\b, \\B) are not supported")
+        raise UnsafePattern(f"{_UNSUPPORTED.get(op, op)} are not supported")
+
+    def pattern(self, pattern: str, index: int) -> int:
+        parsed = _parser.parse(pattern, re.IGNORECASE)
+        match = self.state(_MATCH, [], index)
+        return self.sequence(parsed, match, parsed.state.flags, len(self.kind) + _MAX_STATES)
+
+
+def check(pattern: str) -> None:
+    """Raise re.error if *pattern* is invalid, or UnsafePattern if it is outside the dialect."""
+    _Builder().pattern(pattern, 0)
+
+
+class PatternSet:
+    """Case-insensitive full matches of several patterns at once, in linear time.
+
+    Raises re.error / UnsafePattern for a pattern that can't be compiled.
+    """
+
+    def __init__(self, patterns: list[str]) -> None:
+        nfa = _Builder()
+        starts = [nfa.pattern(pattern, i) for i, pattern in enumerate(patterns)]
+        # Tuples of ints are untracked by the garbage collector
+        self._kind, self._out, self._arg = nfa.kind, [tuple(out) for out in nfa.out], nfa.arg
+        self._root = frozenset(starts)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._states: list[frozenset[int]] = []
+        self._ids: dict[frozenset[int], int] = {}
+        self._next: dict[tuple[int, str], int] = {}
+        self._accepts: dict[tuple[int, bool], frozenset[int]] = {}
+        self._id(self._closure(self._root, at_start=True, at_end=False))
+
+    def _id(self, states: frozenset[int]) -> int:
+        state_id = self._ids.get(states)
+        if state_id is None:
+            state_id = self._ids[states] = len(self._states)
+            self._states.append(states)
+        return state_id
+
+    def _closure(self, states, at_start: bool, at_end: bool) -> frozenset[int]:
+        """*states* plus everything reachable without consuming a character.
+
+        Anchors that don't hold here stay in the set, so a later closure at
+        the end of the text can still pass them.
+        """
+        seen = set()
+        stack = list(states)
+        while stack:
+            state = stack.pop()
+            if state in seen:
+                continue
+            seen.add(state)
+            kind = self._kind[state]
+            if (
+                kind == _SPLIT
+                or (kind == _AT_START and at_start)
+                or (kind == _AT_END and at_end)
+            ):
+                stack.extend(self._out[state])
+        return frozenset(seen)
+
+    def _step(self, state_id: int, ch: str) -> int:
+        moved = [
+            self._out[state][0]
+            for state in self._states[state_id]
+            if self._kind[state] == _CHAR and self._arg[state](ch)
+        ]
+        next_id = self._id(self._closure(moved, at_start=False, at_end=False))
+        self._next[(state_id, ch)] = next_id
+        return next_id
+
+    def _accepting(self, state_id: int, at_start: bool) -> frozenset[int]:
+        key = (state_id, at_start)
+        hits = self._accepts.get(key)
+        if hits is None:
+            closed = self._closure(self._states[state_id], at_start=at_start, at_end=True)
+            hits = self._accepts[key] = frozenset(
+                self._arg[state] for state in closed if self._kind[state] == _MATCH
+            )
+        return hits
+
+    def match(self, text: str) -> frozenset[int]:
+        """Indices of the patterns that match the whole of *text*."""
+        if len(self._states) > _MAX_DFA_STATES:
+            self._reset()
+        state_id = 0
+        for ch in text:
+            next_id = self._next.get((state_id, ch))
+            state_id = self._step(state_id, ch) if next_id is None else next_id
+            if not self._states[state_id]:
+                return frozenset()
+        return self._accepting(state_id, at_start=not text)
@@ -0,0 +1,146 @@
+"""Split the repo space between poller worker replicas.
+
+Repos hash into a fixed number of slots (WORKER_SHARD_SLOTS). A worker polls
+only the repos in slots it holds, and it holds a slot by owning a PostgreSQL
+session-level advisory lock on a connection kept open for the life of the
+process. If a worker dies, its connection drops and its slots unlock for the
+others to pick up — that is the lease.
+
+Live workers heartbeat into ``worker_heartbeats``. On every poll cycle each
+one aims for ceil(slots / live workers) slots, releasing extras and trying
+to lock free ones, so the slots rebalance when workers come and go.
+
+Advisory locks are PostgreSQL-only; on SQLite a single worker owns every slot.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Connection, delete, func, select, text
+
+from app.config import settings
+from app.database import SessionLocal, dialect_insert, engine
+from app.models import WorkerHeartbeat
+
+logger = logging.getLogger(__name__)
+
+# First key of every two-int advisory lock we take, so ours never clash with others'.
+_LOCK_NAMESPACE = 0x1BE11
+
+worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+_conn: Connection | None = None
+_owned: set[int] = set()
+
+
+def _sharded() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def slot_of(repo: str) -> int:
+    """The slot *repo* hashes to — stable across processes and restarts."""
+    digest = hashlib.sha1(repo.lower().encode()).digest()
+    return int.from_bytes(digest[:4], "big") % settings.worker_shard_slots
+
+
+def owns(repo: str) -> bool:
+    """True if this worker should poll *repo*."""
+    return not _sharded() or slot_of(repo) in _owned
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _heartbeat() -> int:
+    """Record that this worker is alive and return how many workers are."""
+    now = _utcnow()
+    db = SessionLocal()
+    try:
+        stmt = dialect_insert(WorkerHeartbeat).values(worker_id=worker_id, last_seen_at=now)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[WorkerHeartbeat.worker_id],
+                set_={"last_seen_at": stmt.excluded.last_seen_at},
+            )
+        )
+        stale = now - timedelta(seconds=settings.worker_lease_ttl)
+        db.execute(delete(WorkerHeartbeat).where(WorkerHeartbeat.last_seen_at < stale))
+        live = db.scalar(select(func.count()).select_from(WorkerHeartbeat))
+        db.commit()
+        return max(live or 1, 1)
+    finally:
+        db.close()
+
+
+def rebalance() -> bool:
+    """Heartbeat, then grow or shrink the held slots toward a fair share.
+
+    Returns True if slots were gained: their repos were polled elsewhere
+    until now, so in-memory per-repo state should be reloaded.
+    """
+    global _conn
+    if not _sharded():
+        return False
+    live = _heartbeat()
+    target = math.ceil(settings.worker_shard_slots / live)
+
+    if _conn is None or _conn.closed:
+        # A new connection means any locks the old one held are gone.
+        _conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        _owned.clear()
+
+    gained = False
+    try:
+        while len(_owned) > target:
+            slot = max(_owned)
+            _conn.execute(
+                text("SELECT pg_advisory_unlock(:ns, :slot)"),
+                {"ns": _LOCK_NAMESPACE, "slot": slot},
+            )
+            _owned.discard(slot)
+        # Start at a per-worker offset so workers don't all race for slot 0.
+        start = int.from_bytes(hashlib.sha1(worker_id.encode()).digest()[:4], "big")
+        for i in range(settings.worker_shard_slots):
+            if len(_owned) >= target:
+                break
+            slot = (start + i) % settings.worker_shard_slots
+            if slot in _owned:
+                continue
+            locked = _conn.execute(
+                text("SELECT pg_try_advisory_lock(:ns, :slot)"),
+                {"ns": _LOCK_NAMESPACE, "slot": slot},
+            ).scalar()
+            if locked:
+                _owned.add(slot)
+                gained = True
+    except Exception:
+        # Drop the connection (and with it every lock) and start over next cycle.
+        _conn.invalidate()
+        _conn = None
+        _owned.clear()
+        raise
+    if gained:
+        logger.info("Worker %s now holds %d/%d slots", worker_id, len(_owned), settings.worker_shard_slots)
+    return gained
+
+
+def release() -> None:
+    """Give up every slot and the heartbeat (on shutdown)."""
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
+    _owned.clear()
+    if not _sharded():
+        return
+    db = SessionLocal()
+    try:
+        db.execute(delete(WorkerHeartbeat).where(WorkerHeartbeat.worker_id == worker_id))
+        db.commit()
+    finally:
+        db.close()
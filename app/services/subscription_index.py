@@ -0,0 +1,290 @@
+"""In-memory inverted index of subscriptions: repo → label pattern → subscribers.
+
+The poller asks "who should hear about an issue with these labels on this
+repo?" once per issue. Instead of scanning every subscription of the repo,
+each repo keeps its literal patterns in a dict keyed by case-folded label and
+its regex patterns in a single ``RepoMatcher`` bucket, so a lookup costs one
+pass over the issue's labels.
+
+The index is loaded from the database once and then kept current by the
+subscription endpoints (``add`` / ``remove``) rather than rebuilt every
+cycle. Those endpoints run in FastAPI's threadpool, so every access takes
+the module lock. Processes that don't serve those endpoints (a separate
+worker, other web replicas) catch up with ``sync``.
+
+A stored pattern the matcher refuses (see ``safe_regex``) is left out of
+the index and its subscription disabled, with the reason recorded for its
+owner.
+"""
+
+import logging
+import re
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Subscription
+from app.services.matching import RepoMatcher, compile_label
+from app.services import user_cache
+from app.services.safe_regex import UnsafePattern
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class IndexedSubscription:
+    sub_id: int
+    user_id: int
+    repo: str
+    label: str
+    last_checked_at: datetime | None
+
+    def is_new(self, created_at: datetime) -> bool:
+        """True if an issue created at *created_at* is new for this subscription."""
+        return self.last_checked_at is None or created_at > self.last_checked_at
+
+
+@dataclass(slots=True)
+class _RepoEntry:
+    subs: dict[int, IndexedSubscription] = field(default_factory=dict)
+    # case-folded literal label → ids of the subscriptions using it
+    literals: dict[str, set[int]] = field(default_factory=dict)
+    # regex pattern → ids of the subscriptions using it
+    regexes: dict[str, set[int]] = field(default_factory=dict)
+    # Built lazily from `regexes`; dropped whenever a regex comes or goes.
+    matcher: RepoMatcher | None = None
+
+    def regex_matcher(self) -> RepoMatcher:
+        if self.matcher is None:
+            self.matcher = RepoMatcher(self.regexes)
+        return self.matcher
+
+
+_lock = threading.RLock()
+_repos: dict[str, _RepoEntry] = {}
+# subscription id → repo, to find an entry by id alone
+_sub_repos: dict[int, str] = {}
+_max_id = 0
+_loaded = False
+# subscription id → reason, for patterns refused since the last _record_disabled()
+_refused: dict[int, str] = {}
+
+_COLUMNS = (
+    Subscription.id,
+    Subscription.user_id,
+    Subscription.repo_full_name,
+    Subscription.label,
+    Subscription.last_checked_at,
+)
+_ACTIVE = Subscription.disabled_reason.is_(None)
+
+
+def _add(sub: IndexedSubscription) -> None:
+    global _max_id
+    _max_id = max(_max_id, sub.sub_id)
+    try:
+        literal = compile_label(sub.label).literal
+    except (re.error, UnsafePattern) as exc:
+        _refused[sub.sub_id] = str(exc)
+        return
+    _sub_repos[sub.sub_id] = sub.repo
+    entry = _repos.setdefault(sub.repo, _RepoEntry())
+    entry.subs[sub.sub_id] = sub
+    if literal is not None:
+        entry.literals.setdefault(literal, set()).add(sub.sub_id)
+    else:
+        if sub.label not in entry.regexes:
+            entry.matcher = None
+        entry.regexes.setdefault(sub.label, set()).add(sub.sub_id)
+
+
+def _discard(bucket: dict[str, set[int]], key: str, sub_id: int) -> bool:
+    """Remove *sub_id* from ``bucket[key]``; True if the key is now gone."""
+    ids = bucket.get(key)
+    if ids is None:
+        return False
+    ids.discard(sub_id)
+    if ids:
+        return False
+    del bucket[key]
+    return True
+
+
+def _remove(sub_id: int) -> None:
+    repo = _sub_repos.pop(sub_id, None)
+    if repo is None:
+        return
+    entry = _repos[repo]
+    sub = entry.subs.pop(sub_id)
+    literal = compile_label(sub.label).literal
+    if literal is not None:
+        _discard(entry.literals, literal, sub_id)
+    elif _discard(entry.regexes, sub.label, sub_id):
+        entry.matcher = None
+    if not entry.subs:
+        del _repos[repo]
+
+
+def _record_disabled() -> None:
+    """Persist the subscriptions refused by _add(), so they stay out of the index."""
+    with _lock:
+        refused = dict(_refused)
+        _refused.clear()
+    if not refused:
+        return
+    db = SessionLocal()
+    try:
+        for sub_id, reason in refused.items():
+            db.execute(
+                update(Subscription).where(Subscription.id == sub_id).values(disabled_reason=reason)
+            )
+        db.commit()
+    finally:
+        db.close()
+    user_cache.clear()
+    for sub_id, reason in refused.items():
+        logger.warning("Subscription %d disabled, its pattern was refused: %s", sub_id, reason)
+
+
+def ensure_loaded(db: Session) -> None:
+    """Build the index from the database the first time it is needed."""
+    global _loaded
+    with _lock:
+        if _loaded:
+            return
+        # Streamed in chunks so a large table is never materialised at once.
+        rows = db.execute(select(*_COLUMNS).where(_ACTIVE).execution_options(yield_per=1000))
+        _repos.clear()
+        _sub_repos.clear()
+        for row in rows:
+            _add(IndexedSubscription(*row))
+        _loaded = True
+    _record_disabled()
+
+
+def add(sub: Subscription) -> None:
+    """Index a newly created subscription."""
+    with _lock:
+        if _loaded:
+            _add(
+                IndexedSubscription(
+                    sub.id, sub.user_id, sub.repo_full_name, sub.label, sub.last_checked_at
+                )
+            )
+
+
+def sync(db: Session) -> None:
+    """Pick up subscriptions created or deleted by another process.
+
+    Ids only grow, so new rows are found past the highest known id; a row
+    count that still disagrees afterwards (deletions, or concurrent commits
+    landing out of id order) falls back to diffing the full id list.
+    """
+    if not _loaded:
+        ensure_loaded(db)
+        return
+    with _lock:
+        known_max = _max_id
+    rows = db.execute(
+        select(*_COLUMNS)
+        .where(Subscription.id > known_max, _ACTIVE)
+        .execution_options(yield_per=1000)
+    ).all()
+    count = db.scalar(select(func.count()).select_from(Subscription).where(_ACTIVE))
+    with _lock:
+        for row in rows:
+            if row.id not in _sub_repos:
+                _add(IndexedSubscription(*row))
+        # Rows refused just now are still counted as active.
+        refused = sum(1 for row in rows if row.id not in _sub_repos)
+        in_sync = count - refused == len(_sub_repos)
+    _record_disabled()
+    if in_sync:
+        return
+    ids = set(db.scalars(select(Subscription.id).where(_ACTIVE)))
+    with _lock:
+        missing = ids - _sub_repos.keys()
+        for sub_id in _sub_repos.keys() - ids:
+            _remove(sub_id)
+    if missing:
+        rows = db.execute(select(*_COLUMNS).where(Subscription.id.in_(missing))).all()
+        with _lock:
+            for row in rows:
+                if row.id not in _sub_repos:
+                    _add(IndexedSubscription(*row))
+        _record_disabled()
+
+
+def remove(sub_id: int) -> None:
+    """Drop a deleted subscription from the index."""
+    with _lock:
+        _remove(sub_id)
+
+
+def repos() -> dict[str, set[int]]:
+    """Every subscribed repo with the ids of the users subscribed to it."""
+    with _lock:
+        return {
+            repo: {sub.user_id for sub in entry.subs.values()}
+            for repo, entry in _repos.items()
+        }
+
+
+def oldest_checkpoint(repo: str, user_ids: set[int]) -> datetime | None:
+    """The earliest last_checked_at among *user_ids*' subscriptions to *repo*."""
+    with _lock:
+        entry = _repos.get(repo)
+        if entry is None:
+            return None
+        checked_ats = [
+            sub.last_checked_at
+            for sub in entry.subs.values()
+            if sub.user_id in user_ids and sub.last_checked_at
+        ]
+    return min(checked_ats) if checked_ats else None
+
+
+def mark_checked(repo: str, checked_at: datetime) -> None:
+    """Mirror a written checkpoint for every subscription to *repo*."""
+    with _lock:
+        entry = _repos.get(repo)
+        if entry is not None:
+            for sub in entry.subs.values():
+                sub.last_checked_at = checked_at
+
+
+def match(
+    repo: str,
+    labels: list[str],
+    accept: Callable[[IndexedSubscription], bool],
+) -> dict[int, tuple[IndexedSubscription, str]]:
+    """Return user id → (subscription, matched label) for an issue with *labels*.
+
+    Only subscriptions passing *accept* count, and each user appears at most
+    once (their lowest-id matching subscription), so a user never gets more
+    than one DM per issue.
+    """
+    with _lock:
+        entry = _repos.get(repo)
+        if entry is None:
+            return {}
+        candidates: dict[int, str] = {}
+        for label in labels:
+            for sub_id in entry.literals.get(label.casefold(), ()):
+                candidates.setdefault(sub_id, label)
+        if entry.regexes:
+            for pattern, label in entry.regex_matcher().match(labels).items():
+                for sub_id in entry.regexes[pattern]:
+                    candidates.setdefault(sub_id, label)
+
+        result: dict[int, tuple[IndexedSubscription, str]] = {}
+        for sub_id in sorted(candidates):
+            sub = entry.subs[sub_id]
+            if sub.user_id not in result and accept(sub):
+                result[sub.user_id] = (sub, candidates[sub_id])
+        return result
@@ -0,0 +1,133 @@
+"""Pool of the stored GitHub tokens the poller fetches with.
+
+A repo is fetched with the healthiest token of one of its subscribers: the
+one with the most rate-limit budget left this tick (see ``ratelimit``). When
+every subscriber's token is spent, parked or revoked, a repo GitHub has
+confirmed public borrows the healthiest token of the whole user base instead,
+so one user's empty quota doesn't leave their repos dark while others have
+calls to spare. A borrowed token is never trusted to tell public from
+private by whether it can read the repo — its owner may be a member of a
+private one — only by GitHub's own answer (see ``visibility``).
+
+Tokens GitHub answers with 401 are revoked: the user is marked in
+``users.github_token_revoked_at`` (the UI asks them to reconnect) and the
+token is never used again.
+"""
+
+import heapq
+import logging
+import math
+from collections.abc import Iterable
+from datetime import datetime, timezone
+
+from sqlalchemy import update
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import User
+from app.services import user_cache
+from app.services.ratelimit import budget_for, token_key
+
+logger = logging.getLogger(__name__)
+
+# GitHub's hourly allowance for an OAuth token (REST calls, and GraphQL
+# points), assumed until a response says otherwise
+_DEFAULT_HOURLY_LIMIT = 5000
+
+# Tokens seen rejected by this process, so each is only recorded once.
+_revoked: set[str] = set()
+
+
+class TokenRevoked(Exception):
+    """GitHub rejected the token itself (401): it was revoked or has expired."""
+
+    def __init__(self, token: str) -> None:
+        super().__init__(f"token {token_key(token)} rejected (401)")
+        self.token = token
+
+
+class RepoUnavailable(Exception):
+    """The token can't see the repo (403/404): it is private to others, or gone."""
+
+    def __init__(self, repo: str, status_code: int) -> None:
+        super().__init__(f"{repo} unavailable (HTTP {status_code})")
+        self.repo = repo
+        self.status_code = status_code
+
+
+class Allowances:
+    """Each healthy token's call budget for this tick, spent as repos are planned.
+
+    *resource* is the ``ratelimit`` budget drawn on: "core" for REST calls,
+    "graphql" for GraphQL queries.
+    """
+
+    def __init__(self, tokens: Iterable[str], now: float, resource: str = "core") -> None:
+        self._now = now
+        self._resource = resource
+        self._left: dict[str, int] = {}
+        for token in tokens:
+            if token not in _revoked:
+                self._left.setdefault(token, self._allowance(token))
+        # Max-heap of (−left, token) for borrowing; entries go stale as tokens
+        # are spent and are fixed up lazily when popped.
+        self._heap = [(-left, token) for token, left in self._left.items() if left > 0]
+        heapq.heapify(self._heap)
+
+    def _allowance(self, token: str) -> int:
+        left = budget_for(token, self._resource).allowance(settings.poll_tick, self._now)
+        if left is None:
+            # Unknown budget (nothing seen yet, or the window just reset):
+            # assume a fresh hour's worth, spread like any other.
+            return max(1, math.floor(_DEFAULT_HOURLY_LIMIT * settings.poll_tick / 3600))
+        return left
+
+    def pick(self, candidates: Iterable[str]) -> str | None:
+        """Spend one call of the candidate with the most budget left, if any has some."""
+        best: str | None = None
+        for token in candidates:
+            left = self._left.get(token, 0)
+            if left > 0 and (best is None or left > self._left[best]):
+                best = token
+        if best is not None:
+            self._left[best] -= 1
+        return best
+
+    def borrow(self) -> str | None:
+        """Spend one call of the pool's healthiest token, if any has budget left."""
+        while self._heap:
+            stored, token = self._heap[0]
+            left = self._left.get(token, 0)
+            if -stored != left:
+                if left > 0:
+                    heapq.heapreplace(self._heap, (-left, token))
+                else:
+                    heapq.heappop(self._heap)
+                continue
+            self._left[token] = left - 1
+            if left > 1:
+                heapq.heapreplace(self._heap, (-(left - 1), token))
+            else:
+                heapq.heappop(self._heap)
+            return token
+        return None
+
+
+def revoke(token: str) -> None:
+    """Mark every user holding *token* as needing to reconnect GitHub."""
+    if token in _revoked:
+        return
+    _revoked.add(token)
+    db = SessionLocal()
+    try:
+        marked = db.execute(
+            update(User)
+            .where(User.github_token == token, User.github_token_revoked_at.is_(None))
+            .values(github_token_revoked_at=datetime.now(timezone.utc).replace(tzinfo=None))
+        ).rowcount
+        db.commit()
+    finally:
+        db.close()
+    if marked:
+        user_cache.clear()
+        logger.warning("GitHub token %s was revoked; %d user(s) asked to reconnect", token_key(token), marked)
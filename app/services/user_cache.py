@@ -0,0 +1,180 @@
+"""Per-process cache of the logged-in user and their subscription list.
+
+Nearly every page view and API call starts by loading the session's user,
+and ``/`` also lists their subscriptions. Both are kept here as immutable
+snapshots keyed by user id, in small LRUs whose entries expire after
+USER_CACHE_TTL seconds.
+
+A user's own writes must show on their next request, whichever replica
+serves it. Every write handler therefore calls ``record_write``, which drops
+the entries in this process and bumps a counter in the user's session
+cookie; entries remember the counter they were loaded under, and any other
+replica reloads when the request's counter differs. Only changes the user
+didn't make themselves (the worker revoking their token, an admin) wait for
+USER_CACHE_TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, MutableMapping
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Generic, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Subscription, User
+
+V = TypeVar("V")
+
+# Session key of the user's write counter
+_SESSION_KEY = "cache_version"
+
+
+@dataclass(slots=True, frozen=True)
+class CachedUser:
+    id: int
+    discord_id: str
+    username: str
+    avatar: str | None
+    github_username: str | None
+    github_connected: bool
+    github_revoked: bool
+    digest_mode: bool
+
+    @property
+    def is_admin(self) -> bool:
+        return self.discord_id == settings.admin_discord_id
+
+
+@dataclass(slots=True, frozen=True)
+class CachedSubscription:
+    id: int
+    user_id: int
+    repo_full_name: str
+    label: str
+    disabled_reason: str | None
+    created_at: datetime
+
+
+class _TTLCache(Generic[V]):
+    """LRU of at most size() entries, each dropped USER_CACHE_TTL seconds after it was stored.
+
+    Entries are stored with the session version they were loaded under and
+    only served to requests carrying that same version.
+    """
+
+    def __init__(self, size: Callable[[], int]) -> None:
+        self._size = size
+        self._entries: OrderedDict[int, tuple[float, int, V]] = OrderedDict()
+        # Request handlers run on the threadpool
+        self._lock = threading.Lock()
+
+    def get(self, key: int, version: int) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic() or entry[1] != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key: int, version: int, value: V) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + settings.user_cache_ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size():
+                self._entries.popitem(last=False)
+
+    def pop(self, key: int) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_users: _TTLCache[CachedUser] = _TTLCache(lambda: settings.user_cache_size)
+_subscriptions: _TTLCache[tuple[CachedSubscription, ...]] = _TTLCache(lambda: settings.user_cache_size)
+
+
+def session_version(session: MutableMapping) -> int:
+    """The write counter of the request's *session*, to pass to the getters."""
+    return session.get(_SESSION_KEY, 0)
+
+
+def cached_user(user_id: int, version: int) -> CachedUser | None:
+    """The user with *user_id* if cached; never touches the database, so safe on the event loop."""
+    return _users.get(user_id, version)
+
+
+def cached_subscriptions(user_id: int, version: int) -> tuple[CachedSubscription, ...] | None:
+    """The user's subscriptions if cached; never touches the database."""
+    return _subscriptions.get(user_id, version)
+
+
+def get_user(db: Session, user_id: int, version: int) -> CachedUser | None:
+    """The user with *user_id*, from the cache or loaded with *db*; None if they don't exist."""
+    cached = _users.get(user_id, version)
+    if cached is not None:
+        return cached
+    user = db.get(User, user_id)
+    if user is None:
+        return None
+    cached = CachedUser(
+        id=user.id,
+        discord_id=user.discord_id,
+        username=user.username,
+        avatar=user.avatar,
+        github_username=user.github_username,
+        github_connected=user.github_token is not None,
+        github_revoked=user.github_token_revoked_at is not None,
+        digest_mode=user.digest_mode,
+    )
+    _users.put(user_id, version, cached)
+    return cached
+
+
+def get_subscriptions(db: Session, user_id: int, version: int) -> tuple[CachedSubscription, ...]:
+    """The user's subscriptions, newest first, from the cache or loaded with *db*."""
+    cached = _subscriptions.get(user_id, version)
+    if cached is not None:
+        return cached
+    rows = db.execute(
+        select(
+            Subscription.id,
+            Subscription.user_id,
+            Subscription.repo_full_name,
+            Subscription.label,
+            Subscription.disabled_reason,
+            Subscription.created_at,
+        )
+        .where(Subscription.user_id == user_id)
+        .order_by(Subscription.created_at.desc())
+    )
+    cached = tuple(CachedSubscription(*row) for row in rows)
+    _subscriptions.put(user_id, version, cached)
+    return cached
+
+
+def record_write(session: MutableMapping, user_id: int) -> None:
+    """Note that the session's user just changed their account or subscriptions.
+
+    Call after the commit: entries loaded before it are dropped here and
+    are no longer served by any replica to this session.
+    """
+    session[_SESSION_KEY] = session_version(session) + 1
+    _users.pop(user_id)
+    _subscriptions.pop(user_id)
+
+
+def clear() -> None:
+    """Drop every entry, for writes that don't know which users they touched."""
+    _users.clear()
+    _subscriptions.clear()
@@ -0,0 +1,132 @@
+"""Which subscribed repos are confirmed public.
+
+A repo's subscribers can always poll it with their own tokens. Other users'
+tokens (see ``tokens``) may only be lent to a repo that GitHub itself has
+reported as public: ``GET /repos/{repo}`` answering ``private: false``. That
+a lent token *can* read a repo proves nothing — its owner may be a member of
+a private one — so success is never taken as evidence.
+
+A repo is therefore in one of three states:
+
+- confirmed public (checked within GITHUB_VISIBILITY_TTL): tokens may be lent;
+- unknown, or public but not rechecked since: a lent token may be used to ask
+  GitHub for the repo's visibility, and nothing else, before the issues are
+  fetched (so a repo that went private is caught);
+- not public — reported private, or a token (the subscribers' own included)
+  got 403/404 for it: only subscribers' tokens are used, for as long as
+  anyone subscribes to it.
+
+The state lives in memory and is persisted to ``repo_visibility`` together
+with the cycle's checkpoints, so it survives restarts.
+"""
+
+from collections.abc import Collection
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import dialect_insert
+from app.models import RepoVisibility
+
+
+@dataclass(slots=True, frozen=True)
+class Visibility:
+    public: bool
+    checked_at: datetime
+
+
+_cache: dict[str, Visibility] = {}
+_dirty: set[str] = set()
+_forgotten: set[str] = set()
+_loaded = False
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def is_public(repo: str) -> bool:
+    """True if GitHub reported *repo* public within GITHUB_VISIBILITY_TTL."""
+    known = _cache.get(repo)
+    return (
+        known is not None
+        and known.public
+        and _now() - known.checked_at < timedelta(seconds=settings.github_visibility_ttl)
+    )
+
+
+def may_borrow(repo: str) -> bool:
+    """True unless *repo* is known not to be public.
+
+    A lent token may only fetch the issues of a repo for which ``is_public``
+    holds; otherwise it must first be used to check the repo's visibility.
+    """
+    known = _cache.get(repo)
+    return known is None or known.public
+
+
+def record(repo: str, public: bool) -> None:
+    _cache[repo] = Visibility(public, _now())
+    _dirty.add(repo)
+    _forgotten.discard(repo)
+
+
+def retain(subscribed: Collection[str]) -> None:
+    """Drop the state of repos nobody subscribes to anymore."""
+    for repo in _cache.keys() - subscribed:
+        del _cache[repo]
+        _dirty.discard(repo)
+        _forgotten.add(repo)
+
+
+def load(db: Session) -> None:
+    """Fill the in-memory cache from the database (once per process)."""
+    global _loaded
+    if _loaded:
+        return
+    rows = db.execute(
+        select(
+            RepoVisibility.repo_full_name,
+            RepoVisibility.public,
+            RepoVisibility.checked_at,
+        ).execution_options(yield_per=1000)
+    )
+    for repo, public, checked_at in rows:
+        _cache.setdefault(repo, Visibility(public, checked_at))
+    _loaded = True
+
+
+def invalidate() -> None:
+    """Make the next load() re-read the table, e.g. after another worker polled these repos.
+
+    Unflushed changes stay in memory and win over the table.
+    """
+    global _loaded
+    for repo in _cache.keys() - _dirty:
+        del _cache[repo]
+    _loaded = False
+
+
+def flush(db: Session) -> None:
+    """Upsert changed states and delete forgotten ones on *db*; the caller commits."""
+    global _dirty, _forgotten
+    dirty, _dirty = _dirty, set()
+    forgotten, _forgotten = _forgotten, set()
+    if forgotten:
+        db.execute(delete(RepoVisibility).where(RepoVisibility.repo_full_name.in_(forgotten)))
+    rows = [
+        {"repo_full_name": repo, "public": known.public, "checked_at": known.checked_at}
+        for repo in dirty
+        if (known := _cache.get(repo)) is not None
+    ]
+    if not rows:
+        return
+    stmt = dialect_insert(RepoVisibility)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[RepoVisibility.repo_full_name],
+        set_={"public": stmt.excluded.public, "checked_at": stmt.excluded.checked_at},
+    )
+    db.execute(stmt, rows)
@@ -0,0 +1,95 @@
+"""IssueBell background worker — the poll scheduler and the outbox sender.
+
+By default they run inside the web process (RUN_WORKER=true), which suits a
+single container. To scale web and polling independently, set
+RUN_WORKER=false on the web tier and run any number of:
+
+    python -m app.worker
+
+Worker replicas split the repos between them (see ``services.shards``) and
+share the outbox safely.
+"""
+
+import asyncio
+import gc
+import logging
+import signal
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app import logs
+from app.config import settings
+from app.database import add_missing_columns, engine, run_db
+from app.models import Base
+from app.services import ledger, metrics, outbox, poller, safe_regex, shards
+from app.services.http import close_clients, open_clients
+
+logger = logging.getLogger(__name__)
+
+
+def start() -> AsyncIOScheduler:
+    """Start polling and DM delivery on the running event loop."""
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        poller.poll_all_users,
+        "interval",
+        seconds=settings.poll_tick,
+        id="poll_all_users",
+        replace_existing=True,
+        coalesce=True,
+    )
+    scheduler.add_job(
+        run_db,
+        "interval",
+        args=[ledger.prune],
+        hours=1,
+        id="prune_ledger",
+        replace_existing=True,
+        coalesce=True,
+    )
+    scheduler.start()
+    outbox.start()
+    logger.info("Scheduler started (tick=%ss)", settings.poll_tick)
+    return scheduler
+
+
+async def stop(scheduler: AsyncIOScheduler) -> None:
+    """Stop scheduling new cycles, then let in-flight work finish.
+
+    The current poll cycle writes its notifications to the outbox, and the
+    sender delivers the batch it has in hand before exiting.
+    """
+    scheduler.shutdown(wait=False)
+    await poller.drain(settings.shutdown_grace_period)
+    await outbox.stop(settings.shutdown_grace_period)
+    await run_db(shards.release)
+    logger.info("Scheduler stopped")
+
+
+async def main() -> None:
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    # Keep everything loaded so far out of full GC collections (see app.main)
+    gc.freeze()
+    safe_regex.warm_up()
+    open_clients()
+    scheduler = start()
+    server = await metrics.serve(settings.metrics_port) if settings.metrics_port else None
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+    logger.info("Worker %s running", shards.worker_id)
+    try:
+        await stopping.wait()
+    finally:
+        if server is not None:
+            server.close()
+        await stop(scheduler)
+        await close_clients()
+
+
+if __name__ == "__main__":
+    logs.configure()
+    asyncio.run(main())
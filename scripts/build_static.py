@@ -0,0 +1,77 @@
+"""
+Fingerprint and precompress static/ into static/dist/ for production.
+
+Every file in static/ is copied to static/dist/ under a content-hashed name
+(style.css -> style.3f9a1c0b7d2e.css). Text formats also get .gz and .br
+variants (.br needs the `brotli` package, and is skipped without it). The
+original -> hashed name map goes to static/dist/manifest.json, which
+`static_url()` in the templates reads. Re-run after changing a static file.
+
+Usage: python scripts/build_static.py
+"""
+
+import gzip
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SRC = Path("static")
+DIST = SRC / "dist"
+MANIFEST = DIST / "manifest.json"
+# Formats worth compressing; PNGs are already deflate-compressed
+COMPRESSIBLE = {".css", ".js", ".json", ".svg", ".txt", ".html", ".ico"}
+# A variant is only kept if it saves at least this fraction of the file
+MIN_SAVING = 0.1
+
+
+def fingerprint(path: Path, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+
+def write_variant(out: Path, suffix: str, original: bytes, compressed: bytes) -> str | None:
+    if len(compressed) > len(original) * (1 - MIN_SAVING):
+        return None
+    out.with_name(out.name + suffix).write_bytes(compressed)
+    return f"{suffix} {len(compressed):,}B"
+
+
+def main() -> None:
+    if not SRC.is_dir():
+        print(f"[ERROR] {SRC} not found — run from the repository root.")
+        raise SystemExit(1)
+    if brotli is None:
+        print("[WARN] brotli is not installed; writing .gz variants only (pip install brotli)")
+
+    shutil.rmtree(DIST, ignore_errors=True)
+    DIST.mkdir()
+
+    manifest: dict[str, str] = {}
+    for path in sorted(p for p in SRC.iterdir() if p.is_file()):
+        data = path.read_bytes()
+        hashed = fingerprint(path, data)
+        out = DIST / hashed
+        out.write_bytes(data)
+        manifest[path.name] = hashed
+
+        variants = []
+        if path.suffix in COMPRESSIBLE:
+            # mtime=0 keeps the .gz bytes identical between builds
+            variants.append(write_variant(out, ".gz", data, gzip.compress(data, 9, mtime=0)))
+            if brotli is not None:
+                variants.append(write_variant(out, ".br", data, brotli.compress(data, quality=11)))
+        extra = ", ".join(v for v in variants if v)
+        print(f"[OK] {out}  ({len(data):,}B{', ' + extra if extra else ''})")
+
+    MANIFEST.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    print(f"[OK] {MANIFEST}  ({len(manifest)} files)")
+
+
+if __name__ == "__main__":
+    main()
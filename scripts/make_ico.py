@@ -8,8 +8,10 @@ from PIL import Image
 
 SRC = Path("static/logo.png")
 DST_ICO = Path("static/favicon.ico")
-# Extra standalone PNGs for og:image / apple-touch-icon
+# Extra standalone PNGs for og:image / apple-touch-icon, and the navbar logo
+# (shown at 34px; 96px stays sharp on high-DPI screens)
 SIZES_PNG = {
+    "static/logo-96.png": 96,
     "static/logo-192.png": 192,
     "static/logo-512.png": 512,
     "static/apple-touch-icon.png": 180,
@@ -49,8 +51,8 @@ def main() -> None:
     # ── extra PNGs ─────────────────────────────────────────────────────────────
     for path, size in SIZES_PNG.items():
         out = Path(path)
-        square.resize((size, size), Image.LANCZOS).save(out, format="PNG")
-        print(f"[OK] {out}  ({size}px)")
+        square.resize((size, size), Image.LANCZOS).save(out, format="PNG", optimize=True)
+        print(f"[OK] {out}  ({size}px, {out.stat().st_size:,}B)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,438 @@
+"""
+Benchmark poll cycles and DM delivery against fake GitHub and Discord backends.
+Usage: python scripts/poll_benchmark.py [--users 2000] [--subscriptions 10000] [--repos 1000]
+                                         [--cycles 3] [--backend rest|graphql]
+                                         [--latency 0.02] [--failure-rate 0.0]
+                                         [--save-baseline]
+
+Seeds a throwaway SQLite database (or, with --database-url, an empty database
+of your choosing — PostgreSQL included), stands in for GitHub and Discord with
+in-process fakes (httpx.MockTransport) that add latency, inject failures and
+enforce rate limits, then:
+
+1. runs --cycles poll cycles with every repo due, opening new issues on a
+   share of the repos before each one (the outbox sender is not running);
+2. starts the outbox sender and times it until every queued DM is delivered.
+
+It reports cycle time, GitHub calls per cycle, DMs per second, peak RSS and
+event-loop lag, and compares them with the scenario's entry in
+scripts/poll_benchmark_baseline.json. --save-baseline records the current
+run there instead. Timings depend on the machine: record a baseline on the
+machine you compare on. Exits non-zero when a metric regressed by more than
+--tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from statistics import mean, median
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "poll_benchmark_baseline.json"
+
+SUBSCRIPTION_LABELS = ["good first issue", "help wanted", "bug", "docs.*", "good.first.*"]
+ISSUE_LABELS = ["good first issue", "help wanted", "bug", "docs: typo", "enhancement", "question"]
+
+# metric → (higher is better, smallest absolute change that can count as a regression)
+METRICS = {
+    "cycle_seconds": (False, 0.0),
+    "cycle_seconds_max": (False, 0.0),
+    "github_calls_per_cycle": (False, 0.0),
+    "dms_per_second": (True, 0.0),
+    "peak_rss_mb": (False, 0.0),
+    # A few ms of scheduler jitter is noise, not a regression.
+    "loop_lag_p99_ms": (False, 10.0),
+    "loop_lag_max_ms": (False, 25.0),
+}
+
+
+def iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class FakeGitHub:
+    """Open issues per repo, ETags, per-token rate-limit windows, REST and GraphQL."""
+
+    def __init__(self, args: argparse.Namespace, rng: random.Random) -> None:
+        self.args = args
+        self.rng = rng
+        self.issues: dict[str, list[dict]] = {}
+        # "resource:token" → [remaining, reset_at]
+        self.windows: dict[str, list[float]] = {}
+        self.calls = 0
+        self.not_modified = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    def open_issues(self, repo: str, count: int, created: datetime) -> None:
+        issues = self.issues.setdefault(repo, [])
+        for _ in range(count):
+            number = issues[0]["number"] + 1 if issues else 1
+            issues.insert(0, {
+                "number": number,
+                "title": f"Issue {number}",
+                "html_url": f"https://github.com/{repo}/issues/{number}",
+                "created_at": iso(created),
+                "user": {"login": "octocat"},
+                "labels": [{"name": self.rng.choice(ISSUE_LABELS)}],
+            })
+        del issues[100:]
+
+    def _spend(self, resource_name: str, token: str, cost: int) -> list[float] | None:
+        """Charge *cost* to the token's window; None if it is exhausted."""
+        now = time.time()
+        window = self.windows.get(f"{resource_name}:{token}")
+        if window is None or now >= window[1]:
+            window = self.windows[f"{resource_name}:{token}"] = [
+                self.args.github_limit, now + self.args.github_window
+            ]
+        if window[0] < cost:
+            return None
+        window[0] -= cost
+        return window
+
+    def _limit_headers(self, window: list[float]) -> dict:
+        return {
+            "X-RateLimit-Limit": str(self.args.github_limit),
+            "X-RateLimit-Remaining": str(int(window[0])),
+            "X-RateLimit-Reset": str(int(window[1])),
+        }
+
+    async def handle(self, request):
+        import httpx
+
+        self.calls += 1
+        await asyncio.sleep(self.args.latency * self.rng.uniform(0.5, 1.5))
+        if self.rng.random() < self.args.failure_rate:
+            self.failed += 1
+            return httpx.Response(502)
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if request.url.path == "/graphql":
+            return self._graphql(request, token)
+
+        if not request.url.path.endswith("/issues"):
+            # GET /repos/{repo}: every benchmark repo is public.
+            window = self._spend("core", token, 1)
+            if window is None:
+                self.rate_limited += 1
+                return httpx.Response(403, headers=self._limit_headers(self.windows[f"core:{token}"]))
+            return httpx.Response(
+                200, headers=self._limit_headers(window), json={"private": False, "visibility": "public"}
+            )
+        repo = request.url.path.removeprefix("/repos/").removesuffix("/issues")
+        issues = self.issues.get(repo, [])
+        etag = f'W/"{repo}:{issues[0]["number"] if issues else 0}"'
+        if request.headers.get("If-None-Match") == etag:
+            # Conditional hits don't count against GitHub's rate limit.
+            self.not_modified += 1
+            return httpx.Response(304, headers={"ETag": etag})
+        window = self._spend("core", token, 1)
+        if window is None:
+            self.rate_limited += 1
+            exhausted = self.windows[f"core:{token}"]
+            return httpx.Response(
+                403, headers=self._limit_headers(exhausted), json={"message": "API rate limit exceeded"}
+            )
+        return httpx.Response(200, headers={"ETag": etag, **self._limit_headers(window)}, json=issues)
+
+    def _graphql(self, request, token: str):
+        import httpx
+
+        variables = json.loads(request.content)["variables"]
+        first = variables["first"]
+        count = sum(1 for key in variables if key.startswith("o"))
+        window = self._spend("graphql", token, 1)
+        if window is None:
+            self.rate_limited += 1
+            return httpx.Response(200, json={"errors": [{"type": "RATE_LIMITED", "message": "limited"}]})
+        data: dict = {
+            "rateLimit": {
+                "cost": 1,
+                "remaining": int(window[0]),
+                "limit": self.args.github_limit,
+                "resetAt": iso(datetime.fromtimestamp(window[1], timezone.utc)),
+            }
+        }
+        for i in range(count):
+            repo = f"{variables[f'o{i}']}/{variables[f'n{i}']}"
+            data[f"r{i}"] = {
+                "visibility": "PUBLIC",
+                "issues": {
+                    "nodes": [
+                        {
+                            "number": issue["number"],
+                            "title": issue["title"],
+                            "url": issue["html_url"],
+                            "createdAt": issue["created_at"],
+                            "author": issue["user"],
+                            "labels": {"nodes": issue["labels"]},
+                        }
+                        for issue in self.issues.get(repo, [])[:first]
+                    ]
+                }
+            }
+        return httpx.Response(200, json={"data": data})
+
+
+class FakeDiscord:
+    """DM channels and messages behind a global requests-per-second limit."""
+
+    def __init__(self, args: argparse.Namespace, rng: random.Random) -> None:
+        self.args = args
+        self.rng = rng
+        self.recent: deque[float] = deque()
+        self.calls = 0
+        self.sent = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    async def handle(self, request):
+        import httpx
+
+        self.calls += 1
+        await asyncio.sleep(self.args.latency * self.rng.uniform(0.5, 1.5))
+        now = time.monotonic()
+        while self.recent and self.recent[0] <= now - 1:
+            self.recent.popleft()
+        if len(self.recent) >= self.args.discord_rps:
+            self.rate_limited += 1
+            retry_after = round(self.recent[0] + 1 - now, 3)
+            return httpx.Response(
+                429, json={"message": "You are being rate limited.", "retry_after": retry_after, "global": True}
+            )
+        self.recent.append(now)
+        if self.rng.random() < self.args.failure_rate:
+            self.failed += 1
+            return httpx.Response(500)
+        if request.url.path.endswith("/users/@me/channels"):
+            recipient = json.loads(request.content)["recipient_id"]
+            return httpx.Response(200, json={"id": f"dm-{recipient}"})
+        self.sent += 1
+        return httpx.Response(200, json={"id": str(self.sent)})
+
+
+async def watch_loop_lag(samples: list[float], interval: float = 0.01) -> None:
+    """Record how late each short sleep wakes up — time the loop spent blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - started - interval)
+
+
+def scenario(args: argparse.Namespace) -> str:
+    return (
+        f"{args.users}u-{args.subscriptions}s-{args.repos}r-{args.cycles}c-{args.backend}"
+        f"-lat{args.latency:g}-fail{args.failure_rate:g}-new{args.new_issue_share:g}"
+    )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # Everything below reads settings at import time, so configure first.
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmp = tempfile.mkdtemp(prefix="issuebell-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ["GITHUB_BACKEND"] = args.backend
+    # Failed sends are retried right away instead of minutes later.
+    os.environ.setdefault("OUTBOX_BACKOFF_BASE", "0.05")
+    os.environ.setdefault("OUTBOX_IDLE_INTERVAL", "0.2")
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+
+    import httpx
+    from sqlalchemy import func, select
+
+    from app.database import SessionLocal, add_missing_columns, engine, run_db
+    from app.models import Base, OutboxMessage, Subscription, User
+    from app.services import cadence, http, outbox, poller
+
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    rng = random.Random(args.seed)
+
+    # ── Seed ──────────────────────────────────────────────────────────────────
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    db = SessionLocal()
+    try:
+        if db.scalar(select(func.count()).select_from(User)):
+            sys.exit("The database already has users; point --database-url at an empty one.")
+        db.execute(
+            User.__table__.insert(),
+            [
+                {"discord_id": str(i), "username": f"user{i}", "github_token": f"token-{i}"}
+                for i in range(1, args.users + 1)
+            ],
+        )
+        subscriptions = {
+            (i % args.users + 1, f"org/repo{rng.randrange(args.repos)}", rng.choice(SUBSCRIPTION_LABELS))
+            for i in range(args.subscriptions)
+        }
+        db.execute(
+            Subscription.__table__.insert(),
+            [
+                {
+                    "user_id": uid,
+                    "repo_full_name": repo,
+                    "label": label,
+                    "last_checked_at": now - timedelta(hours=1),
+                }
+                for uid, repo, label in sorted(subscriptions)
+            ],
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    github = FakeGitHub(args, rng)
+    discord = FakeDiscord(args, rng)
+    repos = sorted({repo for _, repo, _ in subscriptions})
+    for repo in repos:
+        # History from before the checkpoints: sets the cursors, notifies no one.
+        github.open_issues(repo, rng.randint(0, 20), now - timedelta(hours=2))
+    http._clients["github"] = httpx.AsyncClient(transport=httpx.MockTransport(github.handle))
+    http._clients["discord"] = httpx.AsyncClient(transport=httpx.MockTransport(discord.handle))
+
+    lag: list[float] = []
+    watcher = asyncio.create_task(watch_loop_lag(lag))
+
+    # ── Poll cycles ───────────────────────────────────────────────────────────
+    cycle_seconds: list[float] = []
+    calls_per_cycle: list[int] = []
+    for cycle in range(args.cycles):
+        if cycle:
+            created = datetime.now(timezone.utc).replace(tzinfo=None)
+            for repo in rng.sample(repos, int(len(repos) * args.new_issue_share)):
+                github.open_issues(repo, rng.randint(1, 3), created)
+        for repo in repos:
+            cadence.get(repo).next_poll_at = 0
+        calls_before = github.calls
+        started = time.perf_counter()
+        await poller.poll_all_users()
+        cycle_seconds.append(time.perf_counter() - started)
+        calls_per_cycle.append(github.calls - calls_before)
+        print(
+            f"cycle {cycle + 1}: {cycle_seconds[-1]:.2f}s, {calls_per_cycle[-1]} GitHub calls",
+            file=sys.stderr,
+        )
+
+    def pending() -> int:
+        db = SessionLocal()
+        try:
+            return db.scalar(
+                select(func.count()).select_from(OutboxMessage).where(OutboxMessage.status == "pending")
+            )
+        finally:
+            db.close()
+
+    # ── DM delivery ───────────────────────────────────────────────────────────
+    queued = await run_db(pending)
+    outbox.start()
+    started = time.perf_counter()
+    deadline = started + args.drain_timeout
+    while await run_db(pending) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    send_seconds = time.perf_counter() - started
+    await outbox.stop(5)
+    watcher.cancel()
+    await http.close_clients()
+
+    print(
+        f"{len(repos)} repos, {len(subscriptions)} subscriptions; {queued} DMs queued, "
+        f"{discord.sent} sent in {send_seconds:.2f}s; GitHub 304s={github.not_modified} "
+        f"403s={github.rate_limited} 502s={github.failed}; Discord 429s={discord.rate_limited} "
+        f"500s={discord.failed}",
+        file=sys.stderr,
+    )
+    return {
+        "cycle_seconds": round(median(cycle_seconds), 3),
+        "cycle_seconds_max": round(max(cycle_seconds), 3),
+        "github_calls_per_cycle": round(mean(calls_per_cycle), 1),
+        "dms_per_second": round(discord.sent / send_seconds, 1) if send_seconds else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "loop_lag_p99_ms": round(percentile(lag, 99) * 1000, 1),
+        "loop_lag_max_ms": round(max(lag, default=0.0) * 1000, 1),
+    }
+
+
+def compare(results: dict, baseline: dict | None, tolerance: float) -> bool:
+    """Print the results next to the baseline; return False if anything regressed."""
+    ok = True
+    print(f"{'metric':<24}{'value':>12}{'baseline':>12}{'change':>10}")
+    for name, (higher_is_better, slack) in METRICS.items():
+        value = results[name]
+        base = (baseline or {}).get(name)
+        if not base:
+            print(f"{name:<24}{value:>12}{'-':>12}{'':>10}")
+            continue
+        change = (value - base) / base
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance and abs(value - base) > slack:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{name:<24}{value:>12}{base:>12}{change:>+10.0%}{flag}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--subscriptions", type=int, default=10000)
+    parser.add_argument("--repos", type=int, default=1000)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--backend", choices=["rest", "graphql"], default="rest")
+    parser.add_argument("--new-issue-share", type=float, default=0.2,
+                        help="share of repos that get new issues before each cycle after the first")
+    parser.add_argument("--latency", type=float, default=0.02, help="mean fake upstream latency (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="share of fake upstream requests answered with a 5xx")
+    parser.add_argument("--github-limit", type=int, default=5000, help="calls per token per window")
+    parser.add_argument("--github-window", type=float, default=3600.0)
+    parser.add_argument("--discord-rps", type=int, default=50, help="global Discord requests per second")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--database-url", help="an EMPTY database to use instead of a temp SQLite file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative regression before exiting non-zero")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    key = scenario(args)
+    baselines = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    print(f"scenario {key}")
+    ok = compare(results, baselines.get(key), args.tolerance)
+    if args.save_baseline:
+        baselines[key] = results
+        BASELINE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"baseline saved to {BASELINE.relative_to(ROOT)}")
+        return 0
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Check app.services.safe_regex against re.fullmatch(..., re.IGNORECASE).
+Usage: python scripts/safe_regex_check.py
+
+Matches every single-character pattern below against every BMP character,
+and the longer patterns against a list of labels (case-mapping edge cases
+included), and reports each text where the two engines disagree or ours
+raises. Exits non-zero if any do.
+"""
+
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.safe_regex import PatternSet  # noqa: E402
+
+# Tried against every character from U+0000 to U+FFFF
+CHAR_PATTERNS = [
+    "K", "k", "[K]", "[k]", "s", "[S]", "i", "I", "[i]", "İ", "ı", "ß", "ſ", "µ",
+    "[a-z]", "[A-Z]", "[^a-z]", "[^K]", "[Ā-ſ]", "[Ͱ-Ͽ]",
+    "[Ḁ-ỿ]", "[℀-⅏]", "[ﬀ-ﬆ]", ".", "[^\\W]", "\\w", "[\\d]",
+]
+PATTERNS = [
+    "[a-z ]+", "[A-Z ]+", "good first issue", "help[- ]wanted", "(bug|fix).*", "straße",
+    "strasse", "ﬁx", "fix", "ŉ", "İstanbul", "istanbul", "k+", "[^ ]+", "\\w+", ".*",
+]
+LABELS = [
+    "", "bug", "BUG", "straße", "STRASSE", "strasse", "Straße", "ﬁx", "FIX", "fix", "ŉ", "ʼN",
+    "İstanbul", "istanbul", "ISTANBUL", "ıstanbul", "Kelvin K", "KK", "kk", "KK",
+    "good first issue", "Good First Issue", "help wanted", "HELP-WANTED", "ſtraße", "µ", "Μ", "μ",
+    "ǅ", "ǆ", "Ǆ", "ẞ", "ΐ", "ΐ", "a\nb", "🐛 bug",
+]
+
+
+def check(pattern: str, texts) -> int:
+    expected = re.compile(pattern, re.IGNORECASE)
+    ours = PatternSet([pattern])
+    failures = 0
+    for text in texts:
+        want = expected.fullmatch(text) is not None
+        try:
+            got = bool(ours.match(text))
+        except Exception as exc:
+            got = f"{type(exc).__name__}: {exc}"
+        if got != want:
+            failures += 1
+            print(f"FAIL {pattern!r} on {text!r} ({text.encode('unicode_escape').decode()}): re={want} ours={got}")
+    return failures
+
+
+def main() -> int:
+    every_char = [chr(code) for code in range(0x10000) if not 0xD800 <= code < 0xE000]
+    failures = sum(check(pattern, every_char) for pattern in CHAR_PATTERNS)
+    failures += sum(check(pattern, LABELS) for pattern in PATTERNS)
+    total = len(CHAR_PATTERNS) * len(every_char) + len(PATTERNS) * len(LABELS)
+    print(f"{total - failures}/{total} agree")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
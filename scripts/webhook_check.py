@@ -0,0 +1,130 @@
+"""
+Post signed GitHub webhook fixtures at /webhooks/github and check the outcome.
+Usage: python scripts/webhook_check.py
+
+Runs the app in-process against a throwaway SQLite database with one
+subscriber, then sends a handful of `issues` deliveries (plus a forged one and
+a redelivery) and verifies what ended up in the notification outbox. Exits non-zero on the
+first mismatch.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SECRET = "webhook-check"
+
+
+def issue_payload(action: str, number: int, labels: list[str], age: timedelta, label: str | None = None) -> dict:
+    created = (datetime.now(timezone.utc) - age).strftime("%Y-%m-%dT%H:%M:%SZ")
+    payload = {
+        "action": action,
+        "repository": {"full_name": "octocat/Hello-World"},
+        "issue": {
+            "number": number,
+            "title": f"Fixture issue {number}",
+            "html_url": f"https://github.com/octocat/Hello-World/issues/{number}",
+            "created_at": created,
+            "user": {"login": "octocat"},
+            "labels": [{"name": name} for name in labels],
+        },
+    }
+    if label is not None:
+        payload["label"] = {"name": label}
+    return payload
+
+
+def sign(body: bytes, secret: str = SECRET) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+async def main() -> int:
+    # Everything below reads settings at import time, so configure first.
+    tmp = tempfile.mkdtemp(prefix="issuebell-webhook-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/webhook.db"
+    os.environ["GITHUB_WEBHOOK_SECRET"] = SECRET
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+
+    import httpx
+
+    from app.database import SessionLocal
+    from app.main import app
+    from app.models import OutboxMessage, Subscription, User, WebhookRepo
+    from app.schemas import SubscriptionCreate
+    from app.services import ledger, push
+
+    db = SessionLocal()
+    try:
+        user = User(discord_id="1001", username="fixture", github_token="token")
+        db.add(user)
+        db.flush()
+        # Seeded as the API would store it (repo name lowercased); deliveries
+        # name the repo as GitHub spells it.
+        sub = SubscriptionCreate(repo_full_name="octocat/Hello-World", label="good.first.*")
+        db.add(Subscription(user_id=user.id, **sub.model_dump()))
+        db.commit()
+    finally:
+        db.close()
+
+    def outbox_size() -> int:
+        db = SessionLocal()
+        try:
+            return db.query(OutboxMessage).count()
+        finally:
+            db.close()
+
+    # (description, event, payload, signature override, expected status, expected queued)
+    cases = [
+        ("forged signature", "issues", issue_payload("opened", 1, ["good first issue"], timedelta()), sign(b"x"), 401, 0),
+        ("opened, matching label", "issues", issue_payload("opened", 2, ["good first issue"], timedelta()), None, 200, 1),
+        ("redelivery of the same", "issues", issue_payload("opened", 2, ["good first issue"], timedelta()), None, 200, 0),
+        ("opened, other label", "issues", issue_payload("opened", 3, ["bug"], timedelta()), None, 200, 0),
+        ("labeled, fresh issue", "issues", issue_payload("labeled", 3, ["bug", "good first issue"], timedelta(minutes=5), "good first issue"), None, 200, 1),
+        ("labeled, old issue", "issues", issue_payload("labeled", 4, ["good first issue"], timedelta(days=30), "good first issue"), None, 200, 0),
+        ("closed", "issues", issue_payload("closed", 2, ["good first issue"], timedelta()), None, 200, 0),
+    ]
+
+    failures = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        for name, event, payload, signature, status, queued in cases:
+            body = json.dumps(payload).encode()
+            before = outbox_size()
+            resp = await client.post(
+                "/webhooks/github",
+                content=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-GitHub-Event": event,
+                    "X-Hub-Signature-256": signature or sign(body),
+                },
+            )
+            got = outbox_size() - before
+            ok = resp.status_code == status and got == queued
+            failures += not ok
+            print(f"{'ok ' if ok else 'FAIL'} {name:<24} status={resp.status_code} queued={got}")
+
+    db = SessionLocal()
+    try:
+        covered = db.get(WebhookRepo, "octocat/hello-world") is not None
+    finally:
+        db.close()
+    ok = covered and push.is_covered("octocat/hello-world")
+    failures += not ok
+    print(f"{'ok ' if ok else 'FAIL'} {'repo marked push-covered':<24}")
+    ok = ledger.seen((1, "octocat/hello-world", 2))
+    failures += not ok
+    print(f"{'ok ' if ok else 'FAIL'} {'issue in the ledger':<24}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -86,6 +86,26 @@ document.querySelectorAll(".label-preset-btn").forEach((btn) => {
   });
 });
 
+// --- Digest mode -------------------------------------------------------------
+const digestToggle = document.getElementById("digest-toggle");
+digestToggle?.addEventListener("change", async () => {
+  digestToggle.disabled = true;
+  try {
+    const resp = await fetch("/subscriptions/digest", {
+      method: "PUT",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ enabled: digestToggle.checked }),
+    });
+    if (!resp.ok) throw new Error(resp.statusText);
+    digestToggle.checked = (await resp.json()).enabled;
+  } catch (err) {
+    digestToggle.checked = !digestToggle.checked;
+    alert(`Could not update digest mode: ${err.message}`);
+  } finally {
+    digestToggle.disabled = false;
+  }
+});
+
 // --- Add Subscription --------------------------------------------------------
 addForm?.addEventListener("submit", async (e) => {
   e.preventDefault();